@@ -1,6 +1,10 @@
 import streamlit as st
-import json
-from typing import List, Dict
+import os
+from functools import lru_cache
+
+from engine import EngineClient, ServerError
+from instrumentation import prometheus_text, span, start_profiler_from_env, trace
+from reloading_engine import DEFAULT_INTERVAL, ReloadingEngine
 
 # Set page config
 st.set_page_config(
@@ -9,65 +13,53 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Core Logic ---
+# Scoring engine: "python" (default) or "numpy" for the vectorized engine
+MATCH_ENGINE = os.environ.get("MEALPREP_ENGINE", "python")
 
-@st.cache_data
-def load_data():
-    """Loads recipe data from JSON file."""
-    try:
-        with open("data/recipes.json", "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        st.error("recipes.json not found. Please run generate_data.py first.")
-        return []
+# Match scoring: "coverage" (default) or "idf" to weigh rare ingredients over
+# staples like salt; matches scoring below the minimum are not shown
+MATCH_SCORING = os.environ.get("MEALPREP_SCORING", "coverage")
+MIN_SCORE = float(os.environ.get("MEALPREP_MIN_SCORE", "0"))
+
+# Remote matching server (server.py); when unset, matching runs in-process
+SERVER_URL = os.environ.get("MEALPREP_SERVER_URL")
+
+# Shared result cache: entries kept and their lifetime in seconds
+RESULT_CACHE_SIZE = 256
+RESULT_CACHE_TTL = 600
 
-def normalize_ingredient(ingredient: str) -> str:
-    """Simple normalization for fuzzy matching."""
-    return ingredient.lower().strip()
+# Seconds between checks for a rebuilt catalog; 0 turns hot reload off
+RELOAD_INTERVAL = float(os.environ.get("MEALPREP_RELOAD_INTERVAL", DEFAULT_INTERVAL))
 
-def find_matches(user_ingredients: List[str], recipes: List[Dict]) -> List[Dict]:
+# Results per page, and card HTML strings kept across reruns
+PAGE_SIZE = 12
+CARD_CACHE_SIZE = 4096
+
+# Debug panel with per-rerun timings; also shown for ?debug=1 in the URL
+DEBUG = os.environ.get("MEALPREP_DEBUG") == "1"
+
+# Sampling profiler, when MEALPREP_PROFILE is set (see instrumentation.py)
+start_profiler_from_env()
+
+# --- Core Logic ---
+
+@st.cache_resource
+def load_engine():
     """
-    Ranks recipes based on ingredient coverage.
-    Returns recipes with match_score attached.
+    Returns the matching engine, shared by all sessions: a client for the
+    remote server when MEALPREP_SERVER_URL is set, otherwise the catalog,
+    index, facets and result cache loaded once per process and reloaded in
+    the background when the catalog files are rebuilt.
+    Returns None if the catalog is missing.
     """
-    norm_user_ing = set(normalize_ingredient(i) for i in user_ingredients)
-    
-    scored_recipes = []
-    
-    for recipe in recipes:
-        recipe_ing = set(normalize_ingredient(i) for i in recipe['ingredients'])
-        match_count = 0
-        matching_ingredients = []
-        missing_ingredients = []
-        
-        for ring in recipe_ing:
-            # Simple substring matching for "fuzzy" effect
-            # e.g. "egg" matches "large egg"
-            if any(uing in ring or ring in uing for uing in norm_user_ing):
-                match_count += 1
-                matching_ingredients.append(ring)
-            else:
-                missing_ingredients.append(ring)
-        
-        if len(recipe_ing) == 0:
-            score = 0
-        else:
-            score = match_count / len(recipe_ing)
-            
-        # Only keep recipes with at least one match? 
-        # Requirement says "fuzzy match recipes that require subset or small extras"
-        # Let's keep if match > 0
-        if score > 0:
-             # Add computed fields for display
-            recipe_copy = recipe.copy()
-            recipe_copy['match_score'] = score
-            recipe_copy['missing_ingredients'] = missing_ingredients
-            recipe_copy['matching_ingredients'] = matching_ingredients
-            scored_recipes.append(recipe_copy)
-            
-    # Sort by match score (desc), then time (asc)
-    scored_recipes.sort(key=lambda x: (-x['match_score'], x['time']))
-    return scored_recipes
+    if SERVER_URL:
+        return EngineClient(SERVER_URL)
+    try:
+        return ReloadingEngine(scoring_engine=MATCH_ENGINE, interval=RELOAD_INTERVAL,
+                               cache_size=RESULT_CACHE_SIZE, cache_ttl=RESULT_CACHE_TTL,
+                               scoring=MATCH_SCORING, min_score=MIN_SCORE)
+    except FileNotFoundError:
+        return None
 
 # --- UI Components ---
 
@@ -221,7 +213,103 @@ def inject_custom_css():
         </style>
     """, unsafe_allow_html=True)
 
-def main():
+@lru_cache(maxsize=CARD_CACHE_SIZE)
+def card_html(recipe_id, match_pct, title, time, cuisine, veg):
+    """Card markup, built once per recipe and match percentage."""
+    badge_class = "match-badge"
+    if match_pct < 70: badge_class += " partial"
+    if match_pct < 40: badge_class += " low"
+    return f"""
+        <div class="recipe-card">
+            <div class="card-header">
+                <div class="card-title">{title}</div>
+                <div class="{badge_class}">{match_pct}% Match</div>
+            </div>
+            <div class="card-meta">
+                <span>⏱ {time}m</span>
+                <span>🌍 {cuisine}</span>
+                <span>{ '🥬 Veg' if veg else '🍖 Meat' }</span>
+            </div>
+        </div>
+    """
+
+def render_card(r):
+    match_pct = int(r['match_score'] * 100)
+    st.markdown(card_html(r['id'], match_pct, r['title'], r['time'], r['cuisine'], r['veg_bool']),
+                unsafe_allow_html=True)
+
+    # Details are only rendered once opened, unlike an expander whose body
+    # is sent on every rerun
+    if st.toggle("View Details & Shopping List", key=f"details-{r['id']}"):
+        st.markdown(f"**Missing:** {', '.join(r['missing_ingredients']) if r['missing_ingredients'] else 'None!'}")
+        st.markdown("**Instructions:**")
+        for i, step in enumerate(r['steps'], 1):
+            st.caption(f"{i}. {step}")
+
+def render_pager(total_matches):
+    pages = -(-total_matches // PAGE_SIZE)
+    page = st.session_state.page
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("◀ Previous", disabled=page == 0, use_container_width=True):
+            st.session_state.page -= 1
+            st.rerun()
+    with col2:
+        st.markdown(f"<p style='text-align: center'>Page {page + 1} of {pages}</p>", unsafe_allow_html=True)
+    with col3:
+        if st.button("Next ▶", disabled=page + 1 >= pages, use_container_width=True):
+            st.session_state.page += 1
+            st.rerun()
+
+def render_meal_plan(engine, request):
+    """Weekly plan for the current pantry and filters, computed on demand."""
+    st.markdown("---")
+    st.markdown("### 🗓️ Weekly Meal Plan")
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        meals = st.number_input("Meals", min_value=1, max_value=14, value=7)
+        if st.button("Plan My Week", use_container_width=True):
+            try:
+                with span("plan"):
+                    plan = engine.plan(dict(request, size=meals))
+            except ServerError as e:
+                st.error(f"Could not plan the week: {e}")
+                return
+            except OSError as e:
+                st.error(f"Matching server unavailable: {e}")
+                return
+            st.session_state.meal_plan = (request, plan)
+
+    # Only show a plan made for the current pantry and filters
+    saved = st.session_state.get("meal_plan")
+    if saved is None or saved[0] != request:
+        with col2:
+            st.caption("Pick recipes for the week that share ingredients, so the shopping list stays short.")
+        return
+    plan = saved[1]
+    with col2:
+        st.markdown(f"**Shopping list ({len(plan['shopping_list'])}):** "
+                    f"{', '.join(plan['shopping_list']) if plan['shopping_list'] else 'Nothing to buy!'}")
+        st.markdown(f"**From your pantry:** {', '.join(plan['pantry_used']) or 'None'}")
+        if not plan["complete"]:
+            st.caption("Planning hit its time limit; showing the best plan found.")
+        for day, r in enumerate(plan["recipes"], 1):
+            st.markdown(f"{day}. **{r['title']}** · ⏱ {r['time']}m · {int(r['match_score'] * 100)}% match")
+
+def render_debug_panel(rerun):
+    """Timings and counters of this rerun, plus the process-wide metrics."""
+    with st.sidebar:
+        st.markdown("---")
+        st.subheader("🛠 Debug")
+        st.code("\n".join(f"{'  ' * depth}{name}: {seconds * 1000:.1f} ms"
+                          for name, depth, seconds in rerun.spans))
+        st.json(rerun.counters)
+        engine = load_engine()
+        # No gauges without a local catalog
+        if engine is not None and not isinstance(engine, EngineClient):
+            st.code(prometheus_text(engine.gauges()), language="text")
+
+def render_page():
     inject_custom_css()
     
     # Hero Section
@@ -233,8 +321,20 @@ def main():
     """, unsafe_allow_html=True)
 
     # Load Data
-    recipes = load_data()
-    if not recipes:
+    with span("load_engine"):
+        engine = load_engine()
+    if engine is None:
+        st.error("recipes.json not found. Please run generate_data.py first.")
+        return
+    try:
+        catalog_info = engine.info()
+    except ServerError as e:
+        st.error(f"Matching server error: {e}")
+        return
+    except OSError as e:
+        st.error(f"Matching server unavailable: {e}")
+        return
+    if not catalog_info["recipes"]:
         return
 
     # Sidebar Filters
@@ -242,8 +342,8 @@ def main():
         st.header("🔍 Filters")
         st.markdown("---")
         
-        # Extract all cuisines for filter
-        all_cuisines = sorted(list(set(r['cuisine'] for r in recipes)))
+        # Cuisines are precomputed with the catalog facets
+        all_cuisines = catalog_info["cuisines"]
         selected_cuisines = st.multiselect("Cuisine", all_cuisines, default=all_cuisines)
         
         max_time = st.slider("Max Time (mins)", min_value=15, max_value=120, value=60, step=15)
@@ -251,81 +351,89 @@ def main():
         diet_filter = st.radio("Preferences", ["All", "Vegetarian Only", "Non-Vegetarian"])
         
         st.markdown("---")
-        st.info(f"Loaded **{len(recipes)}** recipes")
+        paged = st.toggle("One page at a time", value=True,
+                          help="Render only the page in view instead of a growing list")
+        st.info(f"Loaded **{catalog_info['recipes']}** recipes")
 
     # Main Input
     ingredients_input = st.text_input("What's in your pantry?", "egg, tomato, onion", placeholder="e.g. chicken, rice, garlic")
     
     if ingredients_input:
         user_ingredients = [i.strip() for i in ingredients_input.split(",") if i.strip()]
+        request = {
+            "pantry": user_ingredients,
+            "cuisines": selected_cuisines,
+            "max_time": max_time,
+            "diet": diet_filter,
+        }
+
+        # Pagination / Load More, restarting whenever the query changes
+        if st.session_state.get('last_request') != request:
+            st.session_state.last_request = request
+            st.session_state.page = 0
+            st.session_state.results_count = PAGE_SIZE
+        if paged:
+            offset, limit = st.session_state.page * PAGE_SIZE, PAGE_SIZE
+        else:
+            offset, limit = 0, st.session_state.results_count
         
-        # Filter Logic
-        filtered_recipes = [r for r in recipes if r['cuisine'] in selected_cuisines and r['time'] <= max_time]
-        if diet_filter == "Vegetarian Only":
-            filtered_recipes = [r for r in filtered_recipes if r['veg_bool']]
-        elif diet_filter == "Non-Vegetarian":
-            filtered_recipes = [r for r in filtered_recipes if not r['veg_bool']]
-            
-        # Matching Logic
-        matches = find_matches(user_ingredients, filtered_recipes)
+        # Each session keeps its own incremental ranker, so adding or removing
+        # one ingredient only rescores the recipes that use it. After a catalog
+        # reload it is replaced, which also lets the old catalog be freed.
+        ranker = st.session_state.get('ranker')
+        if 'ranker' not in st.session_state or (ranker is not None and ranker.index is not engine.index):
+            st.session_state.ranker = engine.ranker()
+
+        # Filtering and matching run in the engine; identical queries (in any
+        # order) are answered from its shared cache, including paging reruns
+        try:
+            with span("query"):
+                response = engine.query(dict(request, offset=offset, limit=limit),
+                                        st.session_state.ranker)
+        except ServerError as e:
+            st.error(f"Could not match recipes: {e}")
+            return
+        except OSError as e:
+            st.error(f"Matching server unavailable: {e}")
+            return
+        total_matches = response["total"]
         
-        st.markdown(f"### 🎯 Found {len(matches)} matches")
+        st.markdown(f"### 🎯 Found {total_matches} matches")
         st.write("") # Spacer
         
-        if matches:
-            # Pagination / Load More
-            if 'results_count' not in st.session_state:
-                st.session_state.results_count = 12
-            
+        if total_matches:
             # Grid Layout
             cols = st.columns(3) # 3 Column Grid
             
-            # Display current slice
-            visible_matches = matches[:st.session_state.results_count]
-            
-            for idx, r in enumerate(visible_matches):
-                col = cols[idx % 3]
-                
-                with col:
-                    match_pct = int(r['match_score'] * 100)
-                    badge_class = "match-badge"
-                    if match_pct < 70: badge_class += " partial"
-                    if match_pct < 40: badge_class += " low"
-                    
-                    # HTML Card
-                    st.markdown(f"""
-                        <div class="recipe-card">
-                            <div class="card-header">
-                                <div class="card-title">{r['title']}</div>
-                                <div class="{badge_class}">{match_pct}% Match</div>
-                            </div>
-                            <div class="card-meta">
-                                <span>⏱ {r['time']}m</span>
-                                <span>🌍 {r['cuisine']}</span>
-                                <span>{ '🥬 Veg' if r['veg_bool'] else '🍖 Meat' }</span>
-                            </div>
-                        </div>
-                    """, unsafe_allow_html=True)
-                    
-                    with st.expander("View Details & Shopping List"):
-                        st.markdown(f"**Missing:** {', '.join(r['missing_ingredients']) if r['missing_ingredients'] else 'None!'}")
-                        st.markdown("**Instructions:**")
-                        for i, step in enumerate(r['steps'], 1):
-                            st.caption(f"{i}. {step}")
-
-            # Load More Button
-            if st.session_state.results_count < len(matches):
+            # Only the rows in view are rendered
+            with span("render_cards"):
+                for idx, r in enumerate(response["results"]):
+                    with cols[idx % 3]:
+                        render_card(r)
+
+            if paged:
+                render_pager(total_matches)
+            elif st.session_state.results_count < total_matches:
+                # Load More Button
                 col1, col2, col3 = st.columns([1, 2, 1])
                 with col2:
-                    if st.button(f"Load More Results ({len(matches) - st.session_state.results_count} remaining)", use_container_width=True):
-                        st.session_state.results_count += 12
+                    if st.button(f"Load More Results ({total_matches - st.session_state.results_count} remaining)", use_container_width=True):
+                        st.session_state.results_count += PAGE_SIZE
                         st.rerun()
-        else:
-            # Reset count if no matches or new search
-            st.session_state.results_count = 12
+
+        render_meal_plan(engine, request)
 
     else:
         st.info("👋 Enter some ingredients above to see magic happen!")
 
+def main():
+    # One trace per rerun collects the app's spans (load_engine, query,
+    # render_cards) and the engine's (filter, rank, top_k, materialize)
+    with trace() as rerun:
+        with span("rerun"):
+            render_page()
+    if DEBUG or st.query_params.get("debug") == "1":
+        render_debug_panel(rerun)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,158 @@
+"""
+Batch matching: score many pantries against one catalog.
+
+Reads pantries from a file (one per line, either "egg, tomato, onion" or
+a JSON query object as accepted by engine.py) and streams the top-k recipes
+for each as NDJSON, in input order. The catalog is loaded and indexed once
+per worker process; with the numpy engine, pantries are scored together as
+one sparse matrix product per chunk.
+
+Usage:
+    python batch_match.py pantries.txt --top-k 10 --workers 4 --engine numpy -o results.ndjson
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from engine import CATALOG_BIN, CATALOG_JSON, MatchEngine, parse_cuisines, parse_pantry
+from matcher import ENGINES, match_fields
+
+_engine: Optional[MatchEngine] = None
+
+
+def parse_line(line: str, line_number: int) -> Optional[Dict]:
+    """Turns one input line into a query dict; blank lines are skipped."""
+    line = line.strip()
+    if not line:
+        return None
+    query = json.loads(line) if line.startswith("{") else {"pantry": line}
+    query.setdefault("id", line_number)
+    query["pantry"] = parse_pantry(query.get("pantry"))
+    query["cuisines"] = parse_cuisines(query.get("cuisines"))
+    return query
+
+
+def read_queries(path: str) -> Iterator[Dict]:
+    with (sys.stdin if path == "-" else open(path, "r", encoding="utf-8")) as f:
+        for line_number, line in enumerate(f, 1):
+            query = parse_line(line, line_number)
+            if query is not None:
+                yield query
+
+
+def _row(engine: MatchEngine, pos: int, matched) -> Dict:
+    recipe = engine.recipes[pos]
+    row = {"id": recipe["id"], "title": recipe["title"]}
+    row.update(match_fields(engine.index, pos, matched))
+    return row
+
+
+def match_pantries(engine: MatchEngine, queries: List[Dict], top_k: int) -> List[Dict]:
+    """Top-k results for each query, in order."""
+    ranked = []  # (total, top positions, matched term ids) per query
+
+    if engine.scoring_engine == "numpy":
+        index = engine.index
+        matched_sets = [index.match_terms(q["pantry"]) for q in queries]
+        candidates = [engine.candidates(q.get("cuisines"), q.get("max_time"), q.get("diet", "All"))
+                      for q in queries]
+        vectors = index.vector_engine()
+        step = vectors.batch_size()
+        for start in range(0, len(queries), step):
+            scores = vectors.scores_many(matched_sets[start:start + step])
+            for q in range(scores.shape[1]):
+                column = scores[:, q]
+                keep = (column > 0) & vectors.candidate_mask(candidates[start + q])
+                positions = keep.nonzero()[0]
+                top = vectors.top(positions, -column[positions], top_k)
+                ranked.append((len(positions), top.tolist(), matched_sets[start + q]))
+    else:
+        for query in queries:
+            matches = engine.search(query["pantry"], query.get("cuisines"),
+                                    query.get("max_time"), query.get("diet", "All"))
+            ranked.append((len(matches), matches.positions(top_k), matches.matched))
+
+    return [
+        {"id": query["id"], "total": total,
+         "results": [_row(engine, pos, matched) for pos in positions]}
+        for query, (total, positions, matched) in zip(queries, ranked)
+    ]
+
+
+def _init_worker(json_path: str, bin_path: str, scoring_engine: str):
+    global _engine
+    if _engine is None:  # forked workers inherit the parent's engine
+        _engine = MatchEngine.from_files(json_path, bin_path, scoring_engine=scoring_engine)
+
+
+def _match_chunk(queries: List[Dict], top_k: int) -> List[Dict]:
+    return match_pantries(_engine, queries, top_k)
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(queries: Iterable[Dict], top_k: int = 10, workers: int = 1, chunk_size: int = 256,
+              json_path: str = CATALOG_JSON, bin_path: str = CATALOG_BIN,
+              scoring_engine: str = "python") -> Iterator[Dict]:
+    """Yields one result record per query, in input order."""
+    _init_worker(json_path, bin_path, scoring_engine)
+    chunks = _chunks(queries, chunk_size)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from match_pantries(_engine, chunk, top_k)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(json_path, bin_path, scoring_engine)) as pool:
+        # Bound the chunks in flight so huge inputs stream through
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_match_chunk, chunk, top_k))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank recipes for many pantries and write NDJSON.")
+    parser.add_argument("pantries", help="File with one pantry per line ('-' for stdin)")
+    parser.add_argument("-o", "--output", help="NDJSON output file (default: stdout)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=256, help="Pantries per task")
+    parser.add_argument("--engine", choices=ENGINES, default="python", help="Scoring engine")
+    parser.add_argument("--catalog", default=CATALOG_JSON)
+    parser.add_argument("--catalog-bin", default=CATALOG_BIN)
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.perf_counter()
+    count = 0
+    try:
+        for record in run_batch(read_queries(args.pantries), args.top_k, args.workers,
+                                args.chunk_size, args.catalog, args.catalog_bin, args.engine):
+            out.write(json.dumps(record) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0.0
+    print(f"Matched {count} pantries in {elapsed:.2f}s ({rate:,.0f} pantries/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Benchmark harness for catalog loading, filtering, matching and ranking.
+
+Generates seeded synthetic catalogs at the requested sizes from the same
+ingredient pools as generate_data.py and build_dataset.py, with Zipf-skewed
+ingredient popularity so a few staples dominate like in real recipe data.
+Each catalog size runs in a fresh process so peak memory is per size.
+
+Usage:
+    python benchmark.py --sizes 1000 10000 100000 --pantry-sizes 1 3 5 --output bench.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+import build_dataset
+import generate_data
+from binary_catalog import CompactCatalog, MappedCatalog, write_catalog
+from facets import CatalogFacets
+from json_stream import iter_json_list
+from matcher import ENGINES, RecipeIndex, rank_matches
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Base ingredients from both generators, plus preparation words that stretch
+# the vocabulary into the long tail real catalogs have
+BASE_INGREDIENTS = list(dict.fromkeys(
+    [ing for pool in build_dataset.INGREDIENT_POOL.values() for ing in pool]
+    + generate_data.INGREDIENTS
+))
+MODIFIERS = ["", "fresh", "chopped", "diced", "large", "small", "ground", "dried",
+             "minced", "sliced", "frozen", "organic", "smoked", "roasted", "grated"]
+DIETS = ["All", "Vegetarian Only", "Non-Vegetarian"]
+PAGE_SIZE = 12  # cards rendered per page in the app
+QUERY_SEED_OFFSET = 1 << 32
+
+
+def zipf_weights(count: int, skew: float) -> List[float]:
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+class CatalogGenerator:
+    """Seeded synthetic recipes with Zipf-distributed ingredients."""
+
+    def __init__(self, seed: int, skew: float = 1.1):
+        self.rng = random.Random(seed)
+        vocab = [f"{mod} {base}".strip() for mod in MODIFIERS for base in BASE_INGREDIENTS]
+        # Plain ingredients are the popular head, modified ones the tail
+        self.vocab = vocab
+        self.cum_weights = []
+        total = 0.0
+        for weight in zipf_weights(len(vocab), skew):
+            total += weight
+            self.cum_weights.append(total)
+
+    def ingredients(self, count: int) -> List[str]:
+        return list(dict.fromkeys(self.rng.choices(self.vocab, cum_weights=self.cum_weights, k=count)))
+
+    def recipe(self, recipe_id: int) -> Dict:
+        rng = self.rng
+        ingredients = self.ingredients(rng.randint(3, 10)) + ["salt", "pepper"]
+        cuisine = rng.choice(build_dataset.CUISINES)
+        title = f"{rng.choice(build_dataset.ADJECTIVES)} {cuisine} {ingredients[0].title()} {rng.choice(build_dataset.DISH_TYPES)}"
+        non_veg = ["chicken", "beef", "pork", "salmon", "shrimp", "turkey", "fish"]
+        return {
+            "id": recipe_id,
+            "title": title,
+            "ingredients": ingredients,
+            "steps": [f"Prep: Chop {ingredients[0]}.", "Cook: Simmer for 10-15 minutes.", "Serve hot."],
+            "time": rng.choice([15, 20, 30, 45, 60, 90, 120]),
+            "cuisine": cuisine,
+            "veg_bool": not any(meat in ing for ing in ingredients for meat in non_veg),
+        }
+
+    def catalog(self, size: int):
+        for recipe_id in range(1, size + 1):
+            yield self.recipe(recipe_id)
+
+    def query(self, pantry_size: int) -> Dict:
+        rng = self.rng
+        return {
+            "pantry": self.ingredients(pantry_size),
+            "cuisines": rng.sample(build_dataset.CUISINES, rng.randint(1, len(build_dataset.CUISINES))),
+            "max_time": rng.choice([15, 30, 45, 60, 90, 120]),
+            "diet": rng.choice(DIETS),
+        }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 4),
+        "p99_ms": round(percentile(samples, 99) * 1000, 4),
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 4),
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def write_size(size: int, path: str, args) -> None:
+    """
+    Writes the seeded catalog for one size, streaming it to disk. Runs in
+    its own process, so generating it does not count towards the peak
+    memory of the process that loads it.
+    """
+    recipes = CatalogGenerator(args.seed + size, args.skew).catalog(size)
+    if args.format == "bin":
+        write_catalog(recipes, path)
+    else:
+        for _ in build_dataset.write_json_array(recipes, path):
+            pass
+
+
+def run_size(size: int, path: str, args) -> Dict:
+    """Benchmarks one catalog size, written to `path` by write_size; runs in its own process."""
+    # Queries get their own stream, independent of how the catalog was generated
+    generator = CatalogGenerator(args.seed + size + QUERY_SEED_OFFSET, args.skew)
+    result = {"catalog_size": size, "format": args.format, "catalog_bytes": os.path.getsize(path)}
+
+    started = time.perf_counter()
+    if args.format == "bin":
+        recipes = MappedCatalog(path)
+    elif args.format == "compact":
+        recipes = CompactCatalog(iter_json_list(path))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            recipes = json.load(f)
+    result["load_s"] = round(time.perf_counter() - started, 4)
+
+    started = time.perf_counter()
+    index = RecipeIndex(recipes)
+    result["index_s"] = round(time.perf_counter() - started, 4)
+    result["vocab_size"] = len(index.vocab)
+
+    started = time.perf_counter()
+    facets = CatalogFacets(recipes)
+    result["facets_s"] = round(time.perf_counter() - started, 4)
+
+    if args.engine == "numpy":
+        started = time.perf_counter()
+        index.vector_engine()
+        result["vector_engine_s"] = round(time.perf_counter() - started, 4)
+
+    result["pantries"] = []
+    for pantry_size in args.pantry_sizes:
+        stages = {"filter": [], "match": [], "rank": [], "total": []}
+        match_counts = []
+        for _ in range(args.queries):
+            query = generator.query(pantry_size)
+            t0 = time.perf_counter()
+            candidates = facets.select(query["cuisines"], query["max_time"], query["diet"])
+            t1 = time.perf_counter()
+            matches = rank_matches(query["pantry"], recipes, index,
+                                   engine=args.engine, candidates=candidates)
+            t2 = time.perf_counter()
+            matches[:PAGE_SIZE]
+            t3 = time.perf_counter()
+            stages["filter"].append(t1 - t0)
+            stages["match"].append(t2 - t1)
+            stages["rank"].append(t3 - t2)
+            stages["total"].append(t3 - t0)
+            match_counts.append(len(matches))
+        result["pantries"].append({
+            "pantry_size": pantry_size,
+            "queries": args.queries,
+            "mean_matches": round(sum(match_counts) / len(match_counts), 1),
+            "stages": {stage: summarize(samples) for stage, samples in stages.items()},
+        })
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark load/filter/match/rank on synthetic catalogs.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Catalog sizes to generate (1K to 10M)")
+    parser.add_argument("--pantry-sizes", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--queries", type=int, default=200, help="Queries per pantry size")
+    parser.add_argument("--engine", choices=ENGINES, default="python")
+    parser.add_argument("--format", choices=["json", "compact", "bin"], default="json",
+                        help="Catalog to load: JSON into dicts, JSON into compact columns, or the binary file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for ingredient popularity")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "seed": args.seed,
+        "engine": args.engine,
+        "skew": args.skew,
+        "python": sys.version.split()[0],
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = os.path.join(tmp, f"recipes-{size}.{'bin' if args.format == 'bin' else 'json'}")
+            # Fresh processes to write and then load each size keep peak RSS
+            # attributable to loading and querying that size
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                pool.submit(write_size, size, path, args).result()
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_size, size, path, args).result()
+            os.remove(path)
+            report["results"].append(result)
+            print(f"{size:>10} recipes: load {result['load_s']}s, index {result['index_s']}s, "
+                  f"peak {result['peak_rss_mb']} MB", file=sys.stderr)
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
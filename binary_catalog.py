@@ -0,0 +1,317 @@
+"""
+Compact columnar recipe catalog: binary file format, memory-mapped and in-memory loading.
+
+`write_catalog` turns the recipe list into fixed-width columns: integer
+arrays for ids, near-duplicate cluster ids (see dedup.py), times, cuisines
+and the vegetarian flag, ingredient id arrays with per-recipe offsets into
+an interned vocabulary, the same for canonical ingredient names (see
+canonicalize.py), and string heaps for cuisines, titles and steps.
+`MappedCatalog` maps the file read-only and reads the columns in place, so
+every worker process on a machine shares the same pages and nothing is
+parsed up front. `CompactCatalog` holds the same columns in memory, built
+from recipe dicts when there is no binary file to map.
+
+File layout: an 8-byte magic, a header (byte order, section count), a
+table of (offset, length) pairs, then the sections in SECTIONS order, each
+padded to 8 bytes.
+
+Usage:
+    python binary_catalog.py [data/recipes.json] [data/recipes.bin]
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+from canonicalize import canonical_ingredients
+from json_stream import iter_json_list
+
+MAGIC = b"MPHCAT03"
+HEADER = struct.Struct("<8sBxxxI")
+SECTION = struct.Struct("<QQ")
+
+# (section name, array typecode); "B" sections of *_heap hold UTF-8 text
+SECTIONS = (
+    ("ids", "q"),
+    ("clusters", "q"),
+    ("times", "i"),
+    ("cuisines", "I"),
+    ("veg", "B"),
+    ("ingredient_offsets", "Q"),
+    ("ingredient_ids", "I"),
+    ("vocab_offsets", "Q"),
+    ("vocab_heap", "B"),
+    ("canonical_offsets", "Q"),
+    ("canonical_ids", "I"),
+    ("term_offsets", "Q"),
+    ("term_heap", "B"),
+    ("cuisine_offsets", "Q"),
+    ("cuisine_heap", "B"),
+    ("title_offsets", "Q"),
+    ("title_heap", "B"),
+    ("step_index", "Q"),
+    ("step_offsets", "Q"),
+    ("step_heap", "B"),
+)
+
+RECIPE_FIELDS = ("id", "title", "ingredients", "canonical_ingredients", "steps", "time",
+                 "cuisine", "veg_bool", "cluster_id")
+
+
+class _StringTable:
+    """Interns strings into an offsets array plus a UTF-8 heap."""
+
+    def __init__(self, intern: bool = False):
+        self.offsets = array("Q", [0])
+        self.heap = bytearray()
+        self.ids: Dict[str, int] = {} if intern else None
+
+    def add(self, text: str) -> int:
+        if self.ids is not None:
+            string_id = self.ids.get(text)
+            if string_id is not None:
+                return string_id
+        string_id = len(self.offsets) - 1
+        self.heap += text.encode("utf-8")
+        self.offsets.append(len(self.heap))
+        if self.ids is not None:
+            self.ids[text] = string_id
+        return string_id
+
+
+def build_columns(recipes: Iterable[Dict]) -> Dict[str, array]:
+    """Encodes recipes into the catalog columns (see SECTIONS), in one pass."""
+    ids, clusters = array("q"), array("q")
+    times, cuisines, veg = array("i"), array("I"), array("B")
+    ingredient_offsets, ingredient_ids = array("Q", [0]), array("I")
+    canonical_offsets, canonical_ids = array("Q", [0]), array("I")
+    step_index = array("Q", [0])
+    vocab, cuisine_names = _StringTable(intern=True), _StringTable(intern=True)
+    # Term ids follow first appearance, the same numbering RecipeIndex uses
+    terms, memo = _StringTable(intern=True), {}
+    titles, steps = _StringTable(), _StringTable()
+
+    for recipe in recipes:
+        ids.append(recipe["id"])
+        clusters.append(recipe.get("cluster_id", recipe["id"]))
+        times.append(int(recipe["time"]))
+        cuisines.append(cuisine_names.add(recipe["cuisine"]))
+        veg.append(1 if recipe["veg_bool"] else 0)
+        ingredient_ids.extend(vocab.add(ing) for ing in recipe["ingredients"])
+        ingredient_offsets.append(len(ingredient_ids))
+        names = recipe.get("canonical_ingredients")
+        if names is None:
+            names = canonical_ingredients(recipe["ingredients"], memo)
+        canonical_ids.extend(terms.add(name) for name in names)
+        canonical_offsets.append(len(canonical_ids))
+        titles.add(recipe["title"] or "")
+        for step in recipe["steps"]:
+            steps.add(step)
+        step_index.append(len(steps.offsets) - 1)
+
+    columns = {
+        "ids": ids, "clusters": clusters, "times": times, "cuisines": cuisines, "veg": veg,
+        "ingredient_offsets": ingredient_offsets, "ingredient_ids": ingredient_ids,
+        "vocab_offsets": vocab.offsets, "vocab_heap": vocab.heap,
+        "canonical_offsets": canonical_offsets, "canonical_ids": canonical_ids,
+        "term_offsets": terms.offsets, "term_heap": terms.heap,
+        "cuisine_offsets": cuisine_names.offsets, "cuisine_heap": cuisine_names.heap,
+        "title_offsets": titles.offsets, "title_heap": titles.heap,
+        "step_index": step_index, "step_offsets": steps.offsets, "step_heap": steps.heap,
+    }
+    return columns
+
+
+def write_catalog(recipes: Iterable[Dict], path: str) -> int:
+    """
+    Writes recipes to `path` in the binary catalog format.
+    The file is written next to `path` and moved into place atomically.
+    Returns the number of recipes written.
+    """
+    columns = build_columns(recipes)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        offset = _align(HEADER.size + SECTION.size * len(SECTIONS))
+        table = []
+        for name, _ in SECTIONS:
+            length = len(memoryview(columns[name]).cast("B"))
+            table.append((offset, length))
+            offset = _align(offset + length)
+
+        f.write(HEADER.pack(MAGIC, sys.byteorder == "little", len(SECTIONS)))
+        for entry in table:
+            f.write(SECTION.pack(*entry))
+        for (name, _), (offset, _) in zip(SECTIONS, table):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(memoryview(columns[name]).cast("B"))
+    os.replace(tmp_path, path)
+    return len(columns["ids"])
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+class ColumnCatalog:
+    """
+    Read-only recipe sequence over catalog columns.
+
+    Indexing returns a RecipeView that decodes fields on access, so code
+    written against the list-of-dicts catalog keeps working unchanged.
+    Ingredient names are interned once per catalog and recipes refer to
+    them by id; titles and steps stay UTF-8 bytes until a view reads them.
+    """
+
+    def __init__(self, columns: Dict[str, Sequence]):
+        self._columns = columns
+        self.ids = self._columns["ids"]
+        self.clusters = self._columns["clusters"]
+        self.times = self._columns["times"]
+        self.cuisine_ids = self._columns["cuisines"]
+        self.veg = self._columns["veg"]
+        self.ingredient_offsets = self._columns["ingredient_offsets"]
+        self.ingredient_ids = self._columns["ingredient_ids"]
+        self.canonical_offsets = self._columns["canonical_offsets"]
+        self.canonical_ids = self._columns["canonical_ids"]
+        # The interned tables are small; decode them once
+        self.vocab = self._strings("vocab")
+        self.terms = self._strings("term")
+        self.cuisine_names = self._strings("cuisine")
+
+    def _strings(self, table: str) -> List[str]:
+        offsets = self._columns[f"{table}_offsets"]
+        heap = self._columns[f"{table}_heap"]
+        return [str(heap[offsets[i]:offsets[i + 1]], "utf-8") for i in range(len(offsets) - 1)]
+
+    def _string(self, table: str, i: int) -> str:
+        offsets = self._columns[f"{table}_offsets"]
+        return str(self._columns[f"{table}_heap"][offsets[i]:offsets[i + 1]], "utf-8")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, pos: int) -> "RecipeView":
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("recipe position out of range")
+        return RecipeView(self, pos)
+
+    def __iter__(self) -> Iterator["RecipeView"]:
+        for pos in range(len(self)):
+            yield RecipeView(self, pos)
+
+    def ingredients(self, pos: int) -> List[str]:
+        start, stop = self.ingredient_offsets[pos], self.ingredient_offsets[pos + 1]
+        return [self.vocab[i] for i in self.ingredient_ids[start:stop]]
+
+    def canonical_term_ids(self, pos: int) -> memoryview:
+        """Ids into `terms` of the recipe's canonical ingredients."""
+        return self.canonical_ids[self.canonical_offsets[pos]:self.canonical_offsets[pos + 1]]
+
+    def canonical_ingredients(self, pos: int) -> List[str]:
+        return [self.terms[i] for i in self.canonical_term_ids(pos)]
+
+    def title(self, pos: int) -> str:
+        return self._string("title", pos)
+
+    def steps(self, pos: int) -> List[str]:
+        index = self._columns["step_index"]
+        return [self._string("step", i) for i in range(index[pos], index[pos + 1])]
+
+
+class MappedCatalog(ColumnCatalog):
+    """Column catalog read in place from a memory-mapped binary catalog file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+
+        if len(buf) < HEADER.size + SECTION.size * len(SECTIONS):
+            raise ValueError(f"{path} is truncated")
+        magic, little, count = HEADER.unpack_from(buf, 0)
+        if magic != MAGIC or count != len(SECTIONS):
+            raise ValueError(f"{path} is not a recipe catalog (or has an unknown version)")
+        if bool(little) != (sys.byteorder == "little"):
+            raise ValueError(f"{path} was written on a machine with a different byte order")
+
+        self.nbytes = len(buf)
+        columns = {}
+        for i, (name, typecode) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(buf, HEADER.size + i * SECTION.size)
+            if offset + length > len(buf) or length % struct.calcsize(typecode):
+                raise ValueError(f"{path} is truncated (section {name!r})")
+            columns[name] = buf[offset:offset + length].cast(typecode)
+        super().__init__(columns)
+
+
+class CompactCatalog(ColumnCatalog):
+    """
+    Column catalog built in memory from recipe dicts, e.g. streamed from a
+    JSON file, for when no binary catalog is available. A few hundred bytes
+    per recipe instead of a dict of lists of strings.
+    """
+
+    def __init__(self, recipes: Iterable[Dict]):
+        columns = build_columns(recipes)
+        self.nbytes = sum(len(memoryview(column).cast("B")) for column in columns.values())
+        # Slicing a view does not copy, the same as for MappedCatalog
+        super().__init__({name: memoryview(column) for name, column in columns.items()})
+
+
+class RecipeView(Mapping):
+    """Lazy dict-shaped view of one recipe in a ColumnCatalog."""
+
+    __slots__ = ("_catalog", "_pos")
+
+    def __init__(self, catalog: ColumnCatalog, pos: int):
+        self._catalog = catalog
+        self._pos = pos
+
+    def __getitem__(self, key: str):
+        catalog, pos = self._catalog, self._pos
+        if key == "id":
+            return catalog.ids[pos]
+        if key == "time":
+            return catalog.times[pos]
+        if key == "cluster_id":
+            return catalog.clusters[pos]
+        if key == "cuisine":
+            return catalog.cuisine_names[catalog.cuisine_ids[pos]]
+        if key == "veg_bool":
+            return bool(catalog.veg[pos])
+        if key == "ingredients":
+            return catalog.ingredients(pos)
+        if key == "canonical_ingredients":
+            return catalog.canonical_ingredients(pos)
+        if key == "title":
+            return catalog.title(pos)
+        if key == "steps":
+            return catalog.steps(pos)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(RECIPE_FIELDS)
+
+    def __len__(self) -> int:
+        return len(RECIPE_FIELDS)
+
+    def copy(self) -> Dict:
+        """Materializes the recipe as a plain dict."""
+        return {key: self[key] for key in RECIPE_FIELDS}
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else "data/recipes.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else "data/recipes.bin"
+    count = write_catalog(iter_json_list(source), target)
+    print(f"Wrote {count} recipes to {target} ({os.path.getsize(target)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
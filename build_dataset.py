@@ -1,6 +1,18 @@
+import argparse
+import hashlib
 import json
 import random
 import os
+import textwrap
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from binary_catalog import write_catalog
+from canonicalize import canonical_ingredients
+from dedup import Deduplicator, deduplicate
+from json_stream import iter_json_array
 
 # --- Constants & Generators ---
 
@@ -16,24 +28,24 @@ INGREDIENT_POOL = {
     "Flavor": ["soy sauce", "lemon", "ginger", "chili powder", "cumin", "paprika", "basil", "oregano", "cilantro", "lime", "honey", "mustard"]
 }
 
-def generate_synthetic_recipe(id_counter):
-    cuisine = random.choice(CUISINES)
-    dish_type = random.choice(DISH_TYPES)
-    adj = random.choice(ADJECTIVES)
+def generate_synthetic_recipe(id_counter, rng=random):
+    cuisine = rng.choice(CUISINES)
+    dish_type = rng.choice(DISH_TYPES)
+    adj = rng.choice(ADJECTIVES)
     
     # Pick ingredients ensuring some logic
-    protein = random.choice(INGREDIENT_POOL["Proteins"])
-    carb = random.choice(INGREDIENT_POOL["Carbs"])
-    veg1 = random.choice(INGREDIENT_POOL["Vegetables"])
-    veg2 = random.choice(INGREDIENT_POOL["Vegetables"])
-    flavor = random.choice(INGREDIENT_POOL["Flavor"])
+    protein = rng.choice(INGREDIENT_POOL["Proteins"])
+    carb = rng.choice(INGREDIENT_POOL["Carbs"])
+    veg1 = rng.choice(INGREDIENT_POOL["Vegetables"])
+    veg2 = rng.choice(INGREDIENT_POOL["Vegetables"])
+    flavor = rng.choice(INGREDIENT_POOL["Flavor"])
     
     while veg1 == veg2:
-        veg2 = random.choice(INGREDIENT_POOL["Vegetables"])
+        veg2 = rng.choice(INGREDIENT_POOL["Vegetables"])
 
     ingredients = [protein, carb, veg1, veg2, flavor, "salt", "pepper"]
-    if random.random() > 0.5:
-        ingredients.append(random.choice(INGREDIENT_POOL["Dairy/Fats"]))
+    if rng.random() > 0.5:
+        ingredients.append(rng.choice(INGREDIENT_POOL["Dairy/Fats"]))
 
     title = f"{adj} {cuisine} {protein.capitalize()} {dish_type}"
     
@@ -54,17 +66,26 @@ def generate_synthetic_recipe(id_counter):
         "title": title,
         "ingredients": ingredients,
         "steps": steps,
-        "time": random.choice([15, 20, 30, 45, 60]),
+        "time": rng.choice([15, 20, 30, 45, 60]),
         "cuisine": cuisine,
         "veg_bool": is_veg
     }
 
+# --- Source files ---
+
+def file_hash(path):
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 # --- Normalizers ---
 
-def normalize_forkgasm(data, start_id):
-    normalized = []
-    recipes = data.get("recipe", [])
-    for r in recipes:
+def normalize_forkgasm(recipes, start_id):
+    for i, r in enumerate(recipes):
         ing_list = []
         # Flatten direct ingredients
         if "ingredient" in r:
@@ -96,74 +117,252 @@ def normalize_forkgasm(data, start_id):
         
         is_veg = "Vegetarian" in tags or "Vegan" in tags
         
-        normalized.append({
-            "id": start_id + len(normalized),
+        yield {
+            "id": start_id + i,
             "title": r.get("name", "Unknown Recipe"),
             "ingredients": ing_list,
             "steps": steps,
             "time": 45, # Default since not explicit
             "cuisine": cuisine,
             "veg_bool": is_veg
-        })
-    return normalized
-
-def normalize_dummyjson(data, start_id):
-    normalized = []
-    recipes = data.get("recipes", [])
-    for r in recipes:
-        normalized.append({
-            "id": start_id + len(normalized),
+        }
+
+def normalize_dummyjson(recipes, start_id):
+    for i, r in enumerate(recipes):
+        yield {
+            "id": start_id + i,
             "title": r.get("name"),
             "ingredients": r.get("ingredients", []),
             "steps": r.get("instructions", []),
             "time": r.get("cookTimeMinutes", 30) + r.get("prepTimeMinutes", 0),
             "cuisine": r.get("cuisine", "International"),
             "veg_bool": "Vegetarian" in r.get("tags", [])
-        })
-    return normalized
+        }
 
-def main():
-    all_recipes = []
-    current_id = 1
-    
-    # 1. Load Forkgasm
-    if os.path.exists("data/raw_forkgasm.json"):
-        with open("data/raw_forkgasm.json", "r", encoding="utf-8") as f:
-            try:
-                fg_data = json.load(f)
-                norm_fg = normalize_forkgasm(fg_data, current_id)
-                all_recipes.extend(norm_fg)
-                current_id += len(norm_fg)
-                print(f"Loaded {len(norm_fg)} recipes from Forkgasm")
-            except Exception as e:
-                print(f"Error loading Forkgasm: {e}")
+# --- Build pipeline ---
+
+# Bump when normalizer output changes so cached sources are rebuilt
+BUILD_VERSION = 2
+BUILD_DIR = "data/build"
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+
+# (label, raw file, key of the recipe array, normalizer)
+SOURCES = [
+    ("Forkgasm", "data/raw_forkgasm.json", "recipe", normalize_forkgasm),
+    ("DummyJSON", "data/raw_dummyjson.json", "recipes", normalize_dummyjson),
+]
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest):
+    with open(MANIFEST_PATH + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(MANIFEST_PATH + ".tmp", MANIFEST_PATH)
+
+# --- Sharded (optionally parallel) normalization ---
+
+SHARD_SIZE = 2000
+
+def recipe_rng(seed, id_counter):
+    """
+    Per-recipe RNG for synthetic recipes. Seeding from (seed, id) makes each
+    record independent of which worker generates it, so parallel builds
+    match serial ones for a fixed seed.
+    """
+    if seed is None:
+        return random
+    return random.Random(f"{seed}:{id_counter}")
+
+# Raw ingredient line -> canonical names, shared by the shards a worker runs
+_canonical_memo = {}
+
+def canonicalize_recipes(recipes):
+    """
+    Attaches `canonical_ingredients` (lowercased, plural-folded, without
+    quantities and adjectives, synonyms merged) so the app never has to
+    normalize catalog ingredients at load or query time.
+    """
+    for recipe in recipes:
+        recipe["canonical_ingredients"] = canonical_ingredients(recipe["ingredients"], _canonical_memo)
+    return recipes
+
+def normalize_shard(normalizer, items, start_id):
+    started = time.perf_counter()
+    recipes = canonicalize_recipes(list(normalizer(items, start_id)))
+    return recipes, os.getpid(), time.perf_counter() - started
 
-    # 2. Load DummyJSON
-    if os.path.exists("data/raw_dummyjson.json"):
-        with open("data/raw_dummyjson.json", "r", encoding="utf-8") as f:
+def synthesize_shard(start_id, count, seed):
+    started = time.perf_counter()
+    recipes = canonicalize_recipes([generate_synthetic_recipe(i, recipe_rng(seed, i))
+                                    for i in range(start_id, start_id + count)])
+    return recipes, os.getpid(), time.perf_counter() - started
+
+class ShardRunner:
+    """
+    Runs shard tasks in-process or on a process pool and yields their
+    recipes in shard order, so ids and output do not depend on scheduling.
+    Tracks recipes and busy time per worker for the throughput report.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        self.stats = {}  # worker pid -> [recipes, seconds]
+
+    def _record(self, result):
+        recipes, pid, seconds = result
+        stat = self.stats.setdefault(pid, [0, 0.0])
+        stat[0] += len(recipes)
+        stat[1] += seconds
+        return recipes
+
+    def run(self, task, shards):
+        if self.pool is None:
+            for shard in shards:
+                yield from self._record(task(*shard))
+            return
+        # Bound the shards in flight so memory stays flat on huge inputs
+        pending = deque()
+        for shard in shards:
+            pending.append(self.pool.submit(task, *shard))
+            if len(pending) >= 2 * self.workers:
+                yield from self._record(pending.popleft().result())
+        while pending:
+            yield from self._record(pending.popleft().result())
+
+    def report(self):
+        for pid, (count, seconds) in sorted(self.stats.items()):
+            rate = count / seconds if seconds else 0.0
+            print(f"  worker {pid}: {count} recipes in {seconds:.2f}s ({rate:,.0f} recipes/s)")
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def build_source(runner, raw_path, key, normalizer, cache_path):
+    """Streams one raw source through its normalizer into an NDJSON cache. Returns the count."""
+    count = 0
+    shards = (
+        (normalizer, items, 1 + n * SHARD_SIZE)
+        for n, items in enumerate(chunked(iter_json_array(raw_path, key), SHARD_SIZE))
+    )
+    with open(cache_path + ".tmp", "w", encoding="utf-8") as out:
+        for recipe in runner.run(normalize_shard, shards):
+            out.write(json.dumps(recipe) + "\n")
+            count += 1
+    os.replace(cache_path + ".tmp", cache_path)
+    return count
+
+def iter_ndjson(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def write_json_array(recipes, path):
+    """
+    Streams recipes to `path` as a JSON array, formatted exactly like
+    json.dump(list, indent=4), yielding each recipe after it is written.
+    """
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        first = True
+        for recipe in recipes:
+            f.write("[\n" if first else ",\n")
+            f.write(textwrap.indent(json.dumps(recipe, indent=4), "    "))
+            first = False
+            yield recipe
+        f.write("[]" if first else "\n]")
+    os.replace(path + ".tmp", path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build data/recipes.json from the raw sources.")
+    parser.add_argument("--full", action="store_true", help="Rebuild every source, ignoring cached output")
+    parser.add_argument("--target", type=int, default=1000, help="Fill with synthetic recipes up to this many")
+    parser.add_argument("--workers", type=int, default=1, help="Normalize in this many processes")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed for synthetic recipes; output is identical for any --workers")
+    parser.add_argument("--dedup", choices=("cluster", "drop", "off"), default="cluster",
+                        help="Tag near-duplicate recipes with their cluster (default), drop them, or keep all")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    runner = ShardRunner(args.workers)
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    manifest = {} if args.full else load_manifest()
+    caches = []
+
+    # 1. Normalize each raw source into its NDJSON cache, skipping unchanged ones
+    for label, raw_path, key, normalizer in SOURCES:
+        if not os.path.exists(raw_path):
+            continue
+        cache_path = os.path.join(BUILD_DIR, f"{label.lower()}.ndjson")
+        source_hash = f"{BUILD_VERSION}:{file_hash(raw_path)}"
+        entry = manifest.get(label)
+        if entry and entry["hash"] == source_hash and os.path.exists(cache_path):
+            print(f"Unchanged {label}, reusing {entry['count']} cached recipes")
+        else:
             try:
-                dj_data = json.load(f)
-                norm_dj = normalize_dummyjson(dj_data, current_id)
-                all_recipes.extend(norm_dj)
-                current_id += len(norm_dj)
-                print(f"Loaded {len(norm_dj)} recipes from DummyJSON")
+                count = build_source(runner, raw_path, key, normalizer, cache_path)
             except Exception as e:
-                print(f"Error loading DummyJSON: {e}")
-
-    # 3. Fill the rest with Synthetic
-    target_count = 1000
-    needed = target_count - len(all_recipes)
-    if needed > 0:
-        print(f"Generating {needed} synthetic recipes to reach target...")
-        for _ in range(needed):
-            all_recipes.append(generate_synthetic_recipe(current_id))
-            current_id += 1
-            
-    # Save
-    with open("data/recipes.json", "w", encoding="utf-8") as f:
-        json.dump(all_recipes, f, indent=4)
-    
-    print(f"Done! Saved {len(all_recipes)} recipes to data/recipes.json")
+                print(f"Error loading {label}: {e}")
+                continue
+            entry = manifest[label] = {"hash": source_hash, "count": count}
+            print(f"Loaded {count} recipes from {label}")
+        caches.append((cache_path, entry["count"]))
+    save_manifest(manifest)
+
+    # 2. Merge the caches in source order, assigning ids, then fill the rest with Synthetic
+    total = sum(count for _, count in caches)
+
+    def merged():
+        current_id = 1
+        for cache_path, _ in caches:
+            for recipe in iter_ndjson(cache_path):
+                recipe["id"] = current_id
+                current_id += 1
+                yield recipe
+        needed = args.target - total
+        if needed > 0:
+            print(f"Generating {needed} synthetic recipes to reach target...")
+            shards = (
+                (start, min(SHARD_SIZE, current_id + needed - start), args.seed)
+                for start in range(current_id, current_id + needed, SHARD_SIZE)
+            )
+            yield from runner.run(synthesize_shard, shards)
+
+    # 3. Cluster near-duplicates as they stream past (see dedup.py)
+    recipes = merged()
+    deduplicator = Deduplicator()
+    if args.dedup != "off":
+        recipes = deduplicate(recipes, deduplicator, drop=args.dedup == "drop")
+
+    # Save: the JSON array is streamed out while the binary catalog (compact
+    # columns for memory-mapped loading in the app) is built from the same pass
+    try:
+        count = write_catalog(write_json_array(recipes, "data/recipes.json"), "data/recipes.bin")
+    finally:
+        runner.close()
+    elapsed = time.perf_counter() - started
+    print(f"Done! Saved {count} recipes to data/recipes.json and data/recipes.bin")
+    if deduplicator.duplicates:
+        verb = "Dropped" if args.dedup == "drop" else "Clustered"
+        print(f"{verb} {deduplicator.duplicates} near-duplicate recipes")
+    if runner.stats:
+        print(f"Normalized with {args.workers} worker(s) in {elapsed:.2f}s:")
+        runner.report()
 
 if __name__ == "__main__":
     main()
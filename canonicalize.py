@@ -0,0 +1,167 @@
+"""
+Ingredient canonicalization.
+
+Maps free-text ingredient lines to a canonical name so the same ingredient
+written different ways becomes one vocabulary entry:
+
+    "Large eggplants"            -> "eggplant"
+    "2 cups all-purpose flour"   -> "all-purpose flour"
+    "onions, finely chopped"     -> "onion"
+    "Metaxa or other cognac"     -> "metaxa"
+    "scallions"                  -> "green onion"
+
+Steps: lowercase, drop parentheticals and everything after the first
+comma, keep the first of "x or y" alternatives, strip quantities, units,
+serving notes and preparation adjectives, fold the plural of the head noun,
+then apply the synonym table. The dataset build runs this once per recipe
+(stored as `canonical_ingredients`); at query time only the pantry items
+go through it.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+QUANTITY_WORDS = {
+    "a", "an", "one", "two", "three", "four", "five", "six", "eight", "ten", "dozen",
+    "half", "quarter", "few", "some", "handful", "pinch", "dash",
+}
+UNITS = {
+    "cup", "cups", "tbsp", "tablespoon", "tablespoons", "tsp", "teaspoon", "teaspoons",
+    "g", "gr", "gram", "grams", "kg", "ml", "l", "liter", "liters", "litre", "litres",
+    "oz", "ounce", "ounces", "lb", "lbs", "pound", "pounds", "can", "cans", "package",
+    "packages", "pack", "jar", "stick", "sticks", "bunch", "bunches", "sprig", "sprigs",
+    "slice", "slices", "piece", "pieces", "rasher", "rashers", "pinch", "dash",
+}
+DESCRIPTORS = {
+    "large", "small", "medium", "fresh", "freshly", "chopped", "diced", "minced", "sliced",
+    "grated", "shredded", "finely", "roughly", "thinly", "peeled", "boneless", "skinless",
+    "ripe", "whole", "raw", "dried", "crushed", "softened", "melted", "organic", "ground",
+    "extra", "virgin", "extra-virgin", "free-range", "freerange", "granulated", "cubed",
+    "halved", "trimmed", "frozen", "canned", "shelled", "deveined", "seasoned", "cooked",
+    "concentrated", "dry",
+}
+SERVING_NOTES = re.compile(r"\b(?:to taste|for (?:serving|garnish|dipping|frying)|optional)\b")
+QUANTITY = re.compile(r"^(?:[\d\s/.,½¼¾⅓⅔⅛-]+|\d+%)")
+
+# Words that end in "s" but are not plurals
+UNCOUNTABLE = {
+    "hummus", "couscous", "asparagus", "molasses", "swiss", "citrus", "octopus",
+    "grits", "species", "lemongrass", "bass", "mascarpone", "wasabi", "tahini",
+}
+IRREGULAR_PLURALS = {
+    "leaves": "leaf", "halves": "half", "loaves": "loaf", "cookies": "cookie",
+    "chilies": "chili", "chillies": "chili", "chiles": "chili",
+}
+# Spelling variants, applied word by word
+SPELLINGS = {
+    "chilli": "chili", "chile": "chili", "cinammon": "cinnamon", "tumeric": "turmeric",
+    "mozarella": "mozzarella", "yoghurt": "yogurt", "aubergine": "eggplant",
+    "courgette": "zucchini", "prawn": "shrimp", "pureé": "puree", "purée": "puree",
+}
+
+SYNONYMS = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "garbanzo bean": "chickpea",
+    "aubergine": "eggplant",
+    "courgette": "zucchini",
+    "capsicum": "bell pepper",
+    "coriander leaf": "cilantro",
+    "icing sugar": "powdered sugar",
+    "confectioners sugar": "powdered sugar",
+}
+# Lines that list several seasonings ("salt and pepper to taste") split into each
+SEASONINGS = {"salt", "pepper", "black pepper", "white pepper"}
+# Head nouns an "x or y <noun>" alternative may share with x
+SHARED_NOUNS = {"broth", "stock", "oil", "vinegar", "sauce", "paste", "flour", "wrap", "tortilla"}
+
+
+def singularize(word: str) -> str:
+    """Folds a plural noun to its singular with simple English rules."""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in UNCOUNTABLE or word.endswith(("ss", "us", "is")):
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes", "xes", "zes", "sses")):
+        return word[:-2]
+    if word.endswith("s"):
+        return word[:-1]
+    return word
+
+
+def _name_words(phrase: str) -> List[str]:
+    """Words of one ingredient phrase without quantities, units and descriptors."""
+    words = phrase.split()
+    # Leading quantities and units: "2 cups", "1/2 lb", "half pound"
+    while words and (QUANTITY.fullmatch(words[0]) or words[0] in QUANTITY_WORDS):
+        words.pop(0)
+        if words and words[0].rstrip(".") in UNITS:
+            words.pop(0)
+    if len(words) > 1 and words[0].rstrip(".") in UNITS:
+        words.pop(0)
+    if len(words) > 1 and words[0] == "of":
+        words.pop(0)
+
+    kept = []
+    for i, word in enumerate(words):
+        if word in DESCRIPTORS:
+            continue
+        # "shelled and deveined shrimp": drop "and" joining two descriptors
+        if word == "and" and (not kept or i + 1 == len(words) or words[i + 1] in DESCRIPTORS):
+            continue
+        kept.append(SPELLINGS.get(word, word))
+    if kept:
+        kept[-1] = SPELLINGS.get(singularize(kept[-1]), singularize(kept[-1]))
+    return kept
+
+
+def canonicalize_ingredient(text: str) -> str:
+    """Canonical name of one ingredient line; empty if nothing is left."""
+    text = text.lower().strip()
+    text = re.sub(r"\([^)]*\)?", " ", text)  # parentheticals, even unclosed ones
+    text = text.split(",", 1)[0]             # ", finely chopped"
+    text = SERVING_NOTES.sub(" ", text)
+
+    # "metaxa or other cognac" -> "metaxa", but "beef or vegetable broth"
+    # shares its head noun with both alternatives -> "beef broth"
+    alternatives = re.split(r"\bor\b|(?<!\d)/(?!\d)", text)
+    words = _name_words(alternatives[0])
+    if words and len(alternatives) > 1:
+        other = _name_words(alternatives[1])
+        if len(other) > 1 and other[-1] in SHARED_NOUNS and words[-1] != other[-1]:
+            words.append(other[-1])
+    name = " ".join(words)
+    return SYNONYMS.get(name, name)
+
+
+def split_ingredient(text: str) -> List[str]:
+    """
+    Canonical names in one ingredient line: usually one, but seasoning
+    lists such as "salt and pepper to taste" give one name each.
+    """
+    parts = re.split(r",|\band\b", text.lower())
+    if len(parts) > 1:
+        names = [canonicalize_ingredient(part) for part in parts]
+        if all(name in SEASONINGS for name in names):
+            return names
+    name = canonicalize_ingredient(text)
+    return [name] if name else []
+
+
+def canonical_ingredients(ingredients: Iterable[str],
+                          memo: Optional[Dict[str, List[str]]] = None) -> List[str]:
+    """
+    Canonical names for a recipe's ingredient list, deduplicated in order
+    with empty results dropped. `memo` caches names across recipes.
+    """
+    names = []
+    for ingredient in ingredients:
+        if memo is None:
+            names.extend(split_ingredient(ingredient))
+            continue
+        found = memo.get(ingredient)
+        if found is None:
+            found = memo[ingredient] = split_ingredient(ingredient)
+        names.extend(found)
+    return list(dict.fromkeys(names))
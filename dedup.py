@@ -0,0 +1,132 @@
+"""
+Near-duplicate detection for the dataset build.
+
+Synthetic recipes are drawn from small ingredient pools, so the same
+ingredient set keeps turning up under different titles, and merged sources
+can hold the same dish twice. `Deduplicator` groups such recipes into
+clusters in one streaming pass:
+
+- only recipes with the same cuisine, time and vegetarian flag can share a
+  cluster: RecipeIndex drops duplicates before filters run, so a duplicate
+  must pass every filter its representative passes, and vice versa;
+- recipes with exactly the same ingredient set as an earlier cluster
+  representative join its cluster, whatever their titles;
+- otherwise the ingredient set gets a MinHash signature, split into LSH
+  bands; representatives sharing a band are candidates, and the recipe
+  joins the most similar candidate whose ingredients are near-identical
+  (Jaccard >= INGREDIENT_THRESHOLD) and whose title is similar too (word
+  Jaccard >= TITLE_THRESHOLD);
+- the first recipe of a cluster is its representative, so recipes from
+  the real sources win over synthetic ones.
+
+Every recipe gets a `cluster_id` (its representative's id). RecipeIndex
+only indexes representatives, so matching scores one recipe per cluster.
+"""
+import random
+import re
+import zlib
+from typing import Collection, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from canonicalize import SEASONINGS
+
+NUM_BANDS = 6
+BAND_ROWS = 4
+INGREDIENT_THRESHOLD = 0.75
+TITLE_THRESHOLD = 0.5
+BUCKET_SIZE = 4        # representatives kept per LSH bucket (most recent)
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)   # fixed, so signatures are stable across builds
+_HASHES = [(_rng.randrange(1, _PRIME), _rng.randrange(_PRIME)) for _ in range(NUM_BANDS * BAND_ROWS)]
+
+
+def jaccard(a: Set, b: Collection) -> float:
+    common = len(a.intersection(b))
+    union = len(a) + len(b) - common
+    return common / union if union else 1.0
+
+
+class Deduplicator:
+    """Streaming MinHash/LSH clustering of recipes (see module docstring)."""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}                      # interned ingredient / title word -> id
+        self._hashes: Dict[str, Tuple[int, ...]] = {}        # ingredient -> its value under every hash
+        self._exact: Dict[Tuple, int] = {}                   # (facets, ingredient set) -> representative id
+        self._bands: List[Dict[int, List[int]]] = [{} for _ in range(NUM_BANDS)]  # band key -> representatives
+        self._reps: List[Tuple[int, Tuple[int, ...], Tuple[int, ...]]] = []  # (id, ingredients, title words)
+        self.duplicates = 0
+
+    def _intern(self, words: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(sorted({self._ids.setdefault(w, len(self._ids)) for w in words}))
+
+    def _signature(self, names: List[str]) -> Tuple[int, ...]:
+        columns = []
+        for name in names:
+            values = self._hashes.get(name)
+            if values is None:
+                x = zlib.crc32(name.encode("utf-8"))
+                values = self._hashes[name] = tuple((a * x + b) % _PRIME for a, b in _HASHES)
+            columns.append(values)
+        return tuple(map(min, zip(*columns)))
+
+    def cluster_of(self, recipe: Dict) -> int:
+        """Id of the representative of the recipe's cluster (its own id if new)."""
+        names = recipe.get("canonical_ingredients") or []
+        if not names:
+            return recipe["id"]
+        ingredients = self._intern(names)
+        facets = (recipe.get("cuisine"), recipe.get("time"), bool(recipe.get("veg_bool")))
+        rep_id = self._exact.get((facets, ingredients))
+        if rep_id is not None:
+            self.duplicates += 1
+            return rep_id
+
+        # Salt and pepper are in nearly every recipe; hashing them only
+        # crowds the buckets
+        shingles = [name for name in names if name not in SEASONINGS] or names
+        signature = self._signature(shingles)
+        keys = [hash((facets, signature[b * BAND_ROWS:(b + 1) * BAND_ROWS])) for b in range(NUM_BANDS)]
+        title = self._intern(re.findall(r"\w+", (recipe.get("title") or "").lower()))
+
+        best: Optional[int] = None
+        best_similarity = 0.0
+        candidates = set()
+        for band, key in zip(self._bands, keys):
+            candidates.update(band.get(key, ()))
+        ingredient_set, title_set = set(ingredients), set(title)
+        for rep in sorted(candidates):   # earliest cluster wins ties
+            rep_id, rep_ingredients, rep_title = self._reps[rep]
+            common = len(ingredient_set.intersection(rep_ingredients))
+            similarity = common / (len(ingredients) + len(rep_ingredients) - common)
+            if similarity < INGREDIENT_THRESHOLD or jaccard(title_set, rep_title) < TITLE_THRESHOLD:
+                continue
+            if similarity > best_similarity:
+                best, best_similarity = rep_id, similarity
+
+        if best is not None:
+            self.duplicates += 1
+            return best
+        rep = len(self._reps)
+        self._reps.append((recipe["id"], ingredients, title))
+        self._exact[(facets, ingredients)] = recipe["id"]
+        for band, key in zip(self._bands, keys):
+            bucket = band.setdefault(key, [])
+            bucket.append(rep)
+            if len(bucket) > BUCKET_SIZE:
+                del bucket[0]
+        return recipe["id"]
+
+
+def deduplicate(recipes: Iterable[Dict], deduplicator: Deduplicator,
+                drop: bool = False) -> Iterator[Dict]:
+    """
+    Sets `cluster_id` on each recipe; with `drop`, yields only the
+    representatives instead.
+    """
+    for recipe in recipes:
+        cluster_id = deduplicator.cluster_of(recipe)
+        if drop and cluster_id != recipe["id"]:
+            continue
+        recipe["cluster_id"] = cluster_id
+        yield recipe
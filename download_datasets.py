@@ -1,7 +1,11 @@
+import http.client
+import urllib.error
 import urllib.request
 import json
 import os
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 SOURCES = [
     {
@@ -21,24 +25,171 @@ SOURCES = [
     }
 ]
 
-def download_file():
-    if not os.path.exists("data"):
-        os.makedirs("data")
+CHUNK_SIZE = 1 << 16
+RETRIES = 4
+BACKOFF = 0.5  # seconds, doubled after every failed attempt
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+MANIFEST_NAME = "download_manifest.json"
 
-    for source in SOURCES:
+class TransientError(Exception):
+    """A failure worth retrying (network error, 5xx, truncated body)."""
+
+def load_manifest(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_manifest(dest_dir, manifest):
+    path = os.path.join(dest_dir, MANIFEST_NAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+def _validators(response):
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+def _discard(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def _fetch(source, path, cached):
+    """
+    One download attempt. Returns (status, manifest entry); status is
+    "unchanged" when the server answered 304 to our conditional request.
+    Partial bodies are kept in `path.part` and resumed with a Range request.
+    """
+    part_path = path + ".part"
+    meta_path = part_path + ".json"
+    headers = dict(source.get("headers", {}))
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    partial = {}
+    if offset:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                partial = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            partial = {}
+        headers["Range"] = f"bytes={offset}-"
+        validator = partial.get("etag") or partial.get("last_modified")
+        if validator:
+            # Only resume if the file is still the one we started on
+            headers["If-Range"] = validator
+    elif cached and os.path.exists(path):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    req = urllib.request.Request(source["url"], headers=headers)
+    try:
+        response = urllib.request.urlopen(req, timeout=30)
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return "unchanged", cached
+        if e.code == 416 and offset:
+            # Our partial file does not fit the current body; start over
+            _discard(part_path, meta_path)
+            raise TransientError("range not satisfiable, restarting")
+        if e.code in RETRY_STATUSES:
+            raise TransientError(f"status {e.code}")
+        raise
+    except (urllib.error.URLError, OSError) as e:
+        raise TransientError(str(e))
+
+    with response:
+        if response.status == 206:
+            match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range") or "")
+            start = int(match.group(1)) if match else None
+            if start == 0:
+                mode, offset = "wb", 0
+            elif start == offset:
+                mode = "ab"
+            else:
+                # Appending a range that starts elsewhere would corrupt the file
+                _discard(part_path, meta_path)
+                raise TransientError(f"server sent a range starting at {start}, "
+                                     f"expected {offset}; restarting")
+            validators = {key: partial.get(key) for key in ("etag", "last_modified")}
+            expected = response.headers.get("Content-Length")
+            expected = offset + int(expected) if expected is not None else None
+        elif response.status == 200:
+            # Full body: the server ignored or rejected our Range request
+            mode, offset = "wb", 0
+            validators = _validators(response)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump(validators, f)
+            expected = response.headers.get("Content-Length")
+            expected = int(expected) if expected is not None else None
+        else:
+            raise TransientError(f"status {response.status}")
+
+        try:
+            with open(part_path, mode) as f:
+                for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                    f.write(chunk)
+        except (OSError, http.client.HTTPException) as e:
+            raise TransientError(str(e))
+
+    size = os.path.getsize(part_path)
+    if expected is not None and size != expected:
+        raise TransientError(f"got {size} of {expected} bytes")
+    os.replace(part_path, path)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    return "downloaded", dict(validators, size=size)
+
+def download_file(source, dest_dir="data", cached=None):
+    """
+    Downloads one source to `dest_dir/raw_<name>.json`, retrying transient
+    failures with exponential backoff. Returns (status, manifest entry).
+    """
+    path = os.path.join(dest_dir, f"raw_{source['name']}.json")
+    delay = BACKOFF
+    for attempt in range(1, RETRIES + 1):
+        try:
+            return _fetch(source, path, cached)
+        except TransientError as e:
+            if attempt == RETRIES:
+                raise
+            print(f"⚠️ Retrying {source['name']} in {delay:.1f}s ({e})")
+            time.sleep(delay)
+            delay *= 2
+
+def download_all(sources=SOURCES, dest_dir="data", workers=4):
+    """Downloads all sources concurrently, skipping ones unchanged since the last run."""
+    os.makedirs(dest_dir, exist_ok=True)
+    manifest = load_manifest(dest_dir)
+
+    def run(source):
         print(f"Downloading {source['name']}...")
         try:
-            req = urllib.request.Request(source['url'], headers=source.get('headers', {}))
-            with urllib.request.urlopen(req) as response:
-                if response.status == 200:
-                    data = response.read()
-                    with open(f"data/raw_{source['name']}.json", "wb") as f:
-                        f.write(data)
-                    print(f"✅ Success: {source['name']} ({len(data)} bytes)")
-                else:
-                    print(f"❌ Failed: {source['name']} Status {response.status}")
+            return source, download_file(source, dest_dir, manifest.get(source["name"]))
         except Exception as e:
-            print(f"❌ Error downloading {source['name']}: {e}")
-            
+            return source, e
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for source, result in pool.map(run, sources):
+            if isinstance(result, Exception):
+                print(f"❌ Error downloading {source['name']}: {result}")
+                results[source["name"]] = "failed"
+                continue
+            status, entry = result
+            manifest[source["name"]] = entry
+            results[source["name"]] = status
+            if status == "unchanged":
+                print(f"✅ Unchanged: {source['name']}")
+            else:
+                print(f"✅ Success: {source['name']} ({entry['size']} bytes)")
+    save_manifest(dest_dir, manifest)
+    return results
+
 if __name__ == "__main__":
-    download_file()
+    download_all()
@@ -0,0 +1,277 @@
+"""
+Headless matching engine.
+
+Loads the catalog once, builds the index and facets, and answers pantry
+queries with filtering, ranking and result caching, all without
+Streamlit. The app, the HTTP server (server.py) and scripts use the same
+JSON-shaped query API:
+
+    request:  {"pantry": [...], "cuisines": [...] | None, "max_time": 60 | None,
+               "diet": "All", "offset": 0, "limit": 12}
+    response: {"total": 202, "results": [recipe dicts with match fields]}
+
+Weekly plans (see meal_planner.py) take the same filters plus "size" (at
+most MAX_SIZE) and "time_limit" (at most MAX_TIME_LIMIT), and answer {"recipes": [...], "shopping_list": [...],
+"pantry_used": [...], "cost": 9.5, "complete": true, "elapsed": 0.04}.
+
+EngineClient speaks that API to a remote server, so callers can switch
+between in-process and remote matching without code changes.
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import Dict, Iterable, List, Optional
+
+from binary_catalog import CompactCatalog, MappedCatalog
+from facets import CatalogFacets
+from instrumentation import count, span
+from json_stream import iter_json_list
+from matcher import (ENGINES, SCORINGS, IncrementalRanker, MatchResults, RecipeIndex,
+                     match_fields, rank_matches)
+from meal_planner import DEFAULT_SIZE, DEFAULT_TIME_LIMIT, MAX_SIZE, MAX_TIME_LIMIT, plan_meals
+from result_cache import ResultCache, query_key
+
+CATALOG_JSON = "data/recipes.json"
+CATALOG_BIN = "data/recipes.bin"
+DEFAULT_LIMIT = 12
+DIETS = ("All", "Vegetarian Only", "Non-Vegetarian")
+
+
+def binary_is_current(json_path: str = CATALOG_JSON, bin_path: str = CATALOG_BIN) -> bool:
+    """Whether the binary catalog exists and is at least as new as the JSON file."""
+    return os.path.exists(bin_path) and (
+        not os.path.exists(json_path) or os.path.getmtime(bin_path) >= os.path.getmtime(json_path))
+
+
+def load_catalog(json_path: str = CATALOG_JSON, bin_path: str = CATALOG_BIN):
+    """
+    Loads recipe data. Memory-maps the binary catalog when it is at least as
+    new as the JSON file (and in the current format), otherwise streams the
+    JSON into an in-memory CompactCatalog. Raises FileNotFoundError when
+    neither exists.
+    """
+    with span("load_catalog"):
+        if binary_is_current(json_path, bin_path):
+            try:
+                catalog = MappedCatalog(bin_path)
+                count("bytes_loaded", catalog.nbytes, format="binary")
+                return catalog
+            except ValueError:
+                if not os.path.exists(json_path):
+                    raise
+        size = os.path.getsize(json_path)
+        catalog = CompactCatalog(iter_json_list(json_path))
+        count("bytes_loaded", size, format="json")
+        return catalog
+
+
+def parse_pantry(pantry) -> List[str]:
+    """Accepts a list of ingredients or a comma-separated string; drops blanks."""
+    if isinstance(pantry, str):
+        pantry = pantry.split(",")
+    if not isinstance(pantry, list):
+        raise ValueError("'pantry' must be a list of ingredients or a comma-separated string")
+    return [str(i).strip() for i in pantry if str(i).strip()]
+
+
+def check_request(request) -> Dict:
+    """Accepts a query or plan request, which must be a JSON object."""
+    if not isinstance(request, dict):
+        raise ValueError("Each query must be a JSON object")
+    return request
+
+
+def parse_queries(queries) -> List[Dict]:
+    """Accepts the "queries" of a batch: a list of query objects."""
+    if not isinstance(queries, list):
+        raise ValueError("'queries' must be a list of query objects")
+    return [check_request(query) for query in queries]
+
+
+def parse_cuisines(cuisines) -> Optional[List[str]]:
+    """Accepts None (every cuisine) or a list of cuisine names."""
+    if cuisines is None:
+        return None
+    # A bare string would otherwise be taken as a list of its characters
+    if not isinstance(cuisines, (list, tuple)):
+        raise ValueError("'cuisines' must be a list of cuisine names")
+    return list(cuisines)
+
+
+class MatchEngine:
+    """Catalog, index, facets and result cache for one process."""
+
+    def __init__(self, recipes, scoring_engine: str = "python",
+                 cache: Optional[ResultCache] = None, scoring: str = "coverage",
+                 min_score: float = 0.0):
+        if scoring_engine not in ENGINES:
+            raise ValueError(f"Unknown engine {scoring_engine!r}, expected one of {ENGINES}")
+        if scoring not in SCORINGS:
+            raise ValueError(f"Unknown scoring {scoring!r}, expected one of {SCORINGS}")
+        self.recipes = recipes
+        self.scoring_engine = scoring_engine
+        self.scoring = scoring
+        self.min_score = min_score
+        with span("build_index"):
+            self.index = RecipeIndex(recipes)
+        with span("build_facets"):
+            self.facets = CatalogFacets(recipes)
+        self.cache = cache if cache is not None else ResultCache()
+
+    @classmethod
+    def from_files(cls, json_path: str = CATALOG_JSON, bin_path: str = CATALOG_BIN,
+                   **kwargs) -> "MatchEngine":
+        return cls(load_catalog(json_path, bin_path), **kwargs)
+
+    def info(self) -> Dict:
+        return {"recipes": len(self.recipes), "cuisines": self.facets.cuisines}
+
+    def gauges(self) -> Dict[str, float]:
+        """Current sizes, for the metrics endpoint and the debug panel."""
+        cache = self.cache.stats()
+        return {
+            "catalog_recipes": len(self.recipes),
+            "catalog_terms": len(self.index.vocab),
+            "catalog_duplicates": self.index.duplicates,
+            "result_cache_entries": cache["size"],
+            "result_cache_hit_rate": cache["hit_rate"],
+        }
+
+    def ranker(self) -> Optional[IncrementalRanker]:
+        """
+        A per-session incremental ranker to pass to `search`/`query`, or None
+        when the NumPy engine is in use (it rescores whole columns anyway) or
+        scoring is not plain coverage.
+        """
+        if self.scoring_engine != "python" or self.scoring != "coverage" or self.min_score > 0:
+            return None
+        return IncrementalRanker(self.index)
+
+    def search(self, user_ingredients: List[str], cuisines: Optional[Iterable[str]] = None,
+               max_time: Optional[float] = None, diet: str = "All",
+               ranker: Optional[IncrementalRanker] = None) -> MatchResults:
+        """
+        Filters and ranks the catalog for a pantry; `None` filters match
+        everything. Results are lazy and cached per canonical query. With a
+        `ranker` from `ranker()`, cache misses are scored incrementally from
+        that session's previous pantry; results are the same.
+        """
+        cuisines = parse_cuisines(cuisines)
+        cuisines = self.facets.cuisines if cuisines is None else cuisines
+        max_time = float("inf") if max_time is None else max_time
+        key = query_key(user_ingredients, cuisines, max_time, diet, self.scoring_engine,
+                        self.scoring, self.min_score)
+
+        missed = []
+
+        def run_query():
+            missed.append(True)
+            # Intersect facet bitsets, then match only those recipes
+            with span("filter"):
+                candidates = self.candidates(cuisines, max_time, diet)
+            with span("rank"):
+                if ranker is not None and ranker.index is self.index:
+                    return ranker.rank(user_ingredients, candidates)
+                return rank_matches(user_ingredients, self.recipes, self.index,
+                                    engine=self.scoring_engine, candidates=candidates,
+                                    scoring=self.scoring, min_score=self.min_score)
+
+        with span("search"):
+            results = self.cache.get_or_compute(self.index, key, run_query)
+        count("cache_misses" if missed else "cache_hits")
+        return results
+
+    def candidates(self, cuisines: Optional[Iterable[str]] = None,
+                   max_time: Optional[float] = None, diet: str = "All") -> int:
+        """Facet bitset of the recipes passing the filters; `None` filters match everything."""
+        if diet not in DIETS:
+            raise ValueError(f"Unknown diet {diet!r}, expected one of {DIETS}")
+        cuisines = parse_cuisines(cuisines)
+        cuisines = self.facets.cuisines if cuisines is None else cuisines
+        max_time = float("inf") if max_time is None else max_time
+        return self.facets.select(cuisines, max_time, diet)
+
+    def query(self, request: Dict, ranker: Optional[IncrementalRanker] = None) -> Dict:
+        """Answers one JSON-shaped query (see the module docstring)."""
+        pantry = parse_pantry(check_request(request).get("pantry"))
+        offset = max(0, int(request.get("offset", 0)))
+        limit = max(0, int(request.get("limit", DEFAULT_LIMIT)))
+
+        matches = self.search(pantry, request.get("cuisines"), request.get("max_time"),
+                              request.get("diet", "All"), ranker)
+        return {"total": len(matches), "results": matches[offset:offset + limit]}
+
+    def query_batch(self, requests: List[Dict]) -> List[Dict]:
+        return [self.query(request) for request in parse_queries(requests)]
+
+    def plan(self, request: Dict) -> Dict:
+        """Plans a week of recipes for a JSON-shaped request (see the module docstring)."""
+        pantry = parse_pantry(check_request(request).get("pantry"))
+        # Clamped, so one request cannot keep a worker busy for long
+        size = min(max(1, int(request.get("size", DEFAULT_SIZE))), MAX_SIZE)
+        time_limit = min(max(0.0, float(request.get("time_limit", DEFAULT_TIME_LIMIT))), MAX_TIME_LIMIT)
+        cuisines, max_time = request.get("cuisines"), request.get("max_time")
+        diet = request.get("diet", "All")
+
+        matches = self.search(pantry, cuisines, max_time, diet)
+        plan = plan_meals(self.index, matches, self.candidates(cuisines, max_time, diet),
+                          size, time_limit)
+        recipes = []
+        for pos in plan.pop("positions"):
+            recipe = self.recipes[pos].copy()
+            recipe.update(match_fields(self.index, pos, matches.matched, self.scoring))
+            recipes.append(recipe)
+        return dict(recipes=recipes, **plan)
+
+
+class ServerError(Exception):
+    """The server answered with an error status (e.g. 400 for a bad query)."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class EngineClient:
+    """
+    Same query API as MatchEngine, answered by a remote server.py. Error
+    responses raise ServerError with the server's message; connection
+    failures raise OSError.
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, path: str, payload: Optional[Dict] = None):
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        req = urllib.request.Request(self.url + path, data=data,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            # An OSError too, but the server is up: pass its message on
+            with e:
+                try:
+                    message = json.loads(e.read())["error"]
+                except (ValueError, KeyError, TypeError):
+                    message = f"{e.code} {e.reason}"
+            raise ServerError(e.code, message) from None
+
+    def info(self) -> Dict:
+        return self._call("/info")
+
+    def ranker(self) -> None:
+        """Incremental ranking happens server-side only."""
+        return None
+
+    def query(self, request: Dict, ranker=None) -> Dict:
+        return self._call("/match", request)
+
+    def query_batch(self, requests: List[Dict]) -> List[Dict]:
+        return self._call("/match", {"queries": requests})["results"]
+
+    def plan(self, request: Dict) -> Dict:
+        return self._call("/plan", request)
@@ -0,0 +1,85 @@
+"""
+Precomputed filter facets over a recipe catalog.
+
+Filters are answered with bitsets instead of list comprehensions: a recipe
+set is a Python int whose bit `pos` is set when the recipe at that catalog
+position is included. Intersections are then a handful of big-int ANDs,
+and the resulting mask is passed to the matcher as its candidate set.
+"""
+from bisect import bisect_right
+from typing import Dict, Iterable, List
+
+
+def mask_from_positions(positions: Iterable[int], size: int) -> int:
+    """Builds a bitset with the given recipe positions set."""
+    bits = bytearray((size + 7) // 8)
+    for pos in positions:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, "little")
+
+
+def mask_to_bytes(mask: int, size: int) -> bytes:
+    """Little-endian byte view of a bitset, for cheap per-position tests."""
+    return mask.to_bytes((size + 7) // 8, "little")
+
+
+class CatalogFacets:
+    """
+    Cuisine, time and vegetarian facets built once per catalog.
+
+    - per-cuisine bitsets,
+    - the sorted distinct times, each with the bitset of recipes taking at
+      most that long, so "time <= max_time" is one bisect,
+    - a vegetarian bitset (its complement within `all` is non-vegetarian).
+    """
+
+    def __init__(self, recipes: List[Dict]):
+        self.size = len(recipes)
+        self.all = (1 << self.size) - 1
+
+        by_cuisine: Dict[str, List[int]] = {}
+        by_time: Dict[float, List[int]] = {}
+        veg = []
+        for pos, recipe in enumerate(recipes):
+            by_cuisine.setdefault(recipe['cuisine'], []).append(pos)
+            by_time.setdefault(recipe['time'], []).append(pos)
+            if recipe['veg_bool']:
+                veg.append(pos)
+
+        self.cuisines: List[str] = sorted(by_cuisine)
+        self.cuisine_masks: Dict[str, int] = {
+            cuisine: mask_from_positions(positions, self.size)
+            for cuisine, positions in by_cuisine.items()
+        }
+
+        self.times: List[float] = sorted(by_time)
+        self.time_masks: List[int] = []
+        running = bytearray((self.size + 7) // 8)
+        for time in self.times:
+            for pos in by_time[time]:
+                running[pos >> 3] |= 1 << (pos & 7)
+            self.time_masks.append(int.from_bytes(running, "little"))
+
+        self.veg = mask_from_positions(veg, self.size)
+
+    def by_cuisines(self, cuisines: Iterable[str]) -> int:
+        mask = 0
+        for cuisine in cuisines:
+            mask |= self.cuisine_masks.get(cuisine, 0)
+        return mask
+
+    def by_max_time(self, max_time: float) -> int:
+        i = bisect_right(self.times, max_time)
+        return self.time_masks[i - 1] if i else 0
+
+    def by_diet(self, diet: str) -> int:
+        """`diet` is one of the sidebar options: All, Vegetarian Only, Non-Vegetarian."""
+        if diet == "Vegetarian Only":
+            return self.veg
+        if diet == "Non-Vegetarian":
+            return self.all & ~self.veg
+        return self.all
+
+    def select(self, cuisines: Iterable[str], max_time: float, diet: str = "All") -> int:
+        """Bitset of recipes passing all sidebar filters."""
+        return self.by_cuisines(cuisines) & self.by_max_time(max_time) & self.by_diet(diet)
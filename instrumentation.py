@@ -0,0 +1,186 @@
+"""
+Timing spans, counters and an optional sampling profiler.
+
+    with span("rank"):
+        ...
+    count("recipes_scanned", 1234)
+
+Spans and counters accumulate process-wide and are exported in Prometheus
+text format by `prometheus_text` (served at /metrics by server.py). Inside
+`trace()` they are also recorded for the current thread, so the app's debug
+panel can show where a single rerun spent its time.
+
+Set MEALPREP_PROFILE=<path> to run a sampling profiler that writes
+collapsed stacks (the flamegraph.pl / speedscope input format) to <path>
+when the process exits ("{pid}" in the path is replaced by the process id,
+for multi-process servers); MEALPREP_PROFILE_INTERVAL sets the sampling
+interval in milliseconds (default 5).
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PREFIX = "mealprep"
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_spans: Dict[str, List[float]] = {}   # span name -> [count, total seconds, max seconds]
+_local = threading.local()
+_profiler: Optional["SamplingProfiler"] = None
+
+
+class Trace:
+    """Spans (in start order, with nesting depth) and counters of one traced block."""
+
+    def __init__(self):
+        self.spans: List[List] = []   # [name, depth, seconds]
+        self.counters: Dict[str, float] = {}
+        self.depth = 0
+
+
+@contextmanager
+def trace() -> Iterator[Trace]:
+    """Records the spans and counters of the enclosed block on this thread."""
+    previous = getattr(_local, "trace", None)
+    _local.trace = current = Trace()
+    try:
+        yield current
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Times the enclosed block under `name`."""
+    current = getattr(_local, "trace", None)
+    if current is not None:
+        entry = [name, current.depth, 0.0]
+        current.spans.append(entry)
+        current.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            stats = _spans.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+        if current is not None:
+            entry[2] = elapsed
+            current.depth -= 1
+
+
+def count(name: str, value: float = 1, **labels: str) -> None:
+    """Adds `value` to the counter `name` (with optional labels)."""
+    key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    current = getattr(_local, "trace", None)
+    if current is not None:
+        current.counters[name] = current.counters.get(name, 0) + value
+
+
+def snapshot() -> Dict:
+    """Copies of the process-wide counters and span statistics."""
+    with _lock:
+        return {
+            "counters": {_metric_name(name, labels): value
+                         for (name, labels), value in _counters.items()},
+            "spans": {name: {"count": n, "seconds": total, "max_seconds": longest}
+                      for name, (n, total, longest) in _spans.items()},
+        }
+
+
+def _metric_name(name: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return name
+    pairs = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+                     for k, v in labels)
+    return f"{name}{{{pairs}}}"
+
+
+def prometheus_text(gauges: Optional[Dict[str, float]] = None) -> str:
+    """Counters, span summaries and extra `gauges` in Prometheus text format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        spans = sorted(_spans.items())
+    seen = set()
+    for (name, labels), value in counters:
+        metric = f"{PREFIX}_{name}_total"
+        if metric not in seen:
+            lines.append(f"# TYPE {metric} counter")
+            seen.add(metric)
+        lines.append(f"{_metric_name(metric, labels)} {value:g}")
+    if spans:
+        lines.append(f"# TYPE {PREFIX}_span_seconds summary")
+        for name, (n, total, _) in spans:
+            lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {n}')
+            lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f"# TYPE {PREFIX}_span_max_seconds gauge")
+        for name, (_, _, longest) in spans:
+            lines.append(f'{PREFIX}_span_max_seconds{{span="{name}"}} {longest:.6f}')
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {PREFIX}_{name} gauge")
+        lines.append(f"{PREFIX}_{name} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler(threading.Thread):
+    """
+    Samples every thread's Python stack at a fixed interval and counts
+    identical stacks; `dump` writes them as collapsed stacks.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        super().__init__(name="mealprep-profiler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, samples in self.stacks.most_common():
+                f.write(f"{stack} {samples}\n")
+
+
+def start_profiler_from_env() -> Optional[SamplingProfiler]:
+    """Starts the sampling profiler once per process if MEALPREP_PROFILE is set."""
+    global _profiler
+    path = os.environ.get("MEALPREP_PROFILE")
+    if not path or _profiler is not None:
+        return _profiler
+    path = path.replace("{pid}", str(os.getpid()))
+    interval = float(os.environ.get("MEALPREP_PROFILE_INTERVAL", "5")) / 1000
+    _profiler = SamplingProfiler(interval)
+    _profiler.start()
+
+    def finish():
+        _profiler.stop()
+        _profiler.join(1.0)
+        _profiler.dump(path)
+
+    atexit.register(finish)
+    return _profiler
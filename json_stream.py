@@ -0,0 +1,109 @@
+"""
+Streaming JSON array reader.
+
+Parses huge JSON files item by item (the raw sources during the build, the
+recipe catalog when the app loads it), so memory is bounded by the largest
+single item rather than the whole file.
+"""
+import json
+
+# Characters that can continue a number, so one ending here may be cut short
+NUMBER_CHARS = frozenset("0123456789.eE+-")
+
+
+class JsonArrayStream:
+    """
+    Incrementally parses a top-level JSON object and yields the items of the
+    array stored under one key (or the items of a top-level array), reading
+    the file in chunks.
+    """
+
+    def __init__(self, f, chunk_size=1 << 16):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        # Drop what has been consumed before growing the buffer
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def _expect(self, chars):
+        ch = self._peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Expected one of {chars!r} but found {ch or 'end of file'!r}")
+        self.pos += 1
+        return ch
+
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number split across chunks ("1." + "5") decodes as a
+                # shorter number, so it is only complete once something
+                # else follows it
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    complete = end < len(self.buf) and self.buf[end] not in NUMBER_CHARS
+                else:
+                    complete = end < len(self.buf)
+                if complete or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def _elements(self):
+        self._expect("[")
+        if self._peek() == "]":
+            return
+        while True:
+            yield self._value()
+            if self._expect(",]") == "]":
+                return
+
+    def items(self, key):
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            name = self._value()
+            self._expect(":")
+            if name == key and self._peek() == "[":
+                yield from self._elements()
+                return
+            self._value()  # skip values under other keys
+            if self._expect(",}") == "}":
+                return
+
+    def elements(self):
+        """Yields the items of a top-level JSON array."""
+        yield from self._elements()
+
+
+def iter_json_array(path, key):
+    """Yields the items of `key` in the JSON object stored at `path`."""
+    with open(path, "r", encoding="utf-8") as f:
+        yield from JsonArrayStream(f).items(key)
+
+
+def iter_json_list(path):
+    """Yields the items of the top-level JSON array stored at `path`."""
+    with open(path, "r", encoding="utf-8") as f:
+        yield from JsonArrayStream(f).elements()
@@ -0,0 +1,644 @@
+"""
+Ingredient matching: normalization, the inverted ingredient index and ranking.
+
+Kept free of Streamlit so it can be imported by scripts as well as the app.
+"""
+import heapq
+import math
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from canonicalize import SEASONINGS, canonical_ingredients, canonicalize_ingredient, split_ingredient
+from facets import mask_from_positions, mask_to_bytes
+from instrumentation import count, span
+from vector_engine import VectorEngine
+
+
+def normalize_ingredient(ingredient: str) -> str:
+    """Canonical ingredient name used for matching (see canonicalize.py)."""
+    return canonicalize_ingredient(ingredient)
+
+
+class SubstringMatcher:
+    """
+    Finds the vocabulary entries a pantry item matches in either direction:
+    the entry contains the item ("egg" -> "large eggs") or the item contains
+    the entry ("large egg" -> "egg").
+
+    Entries are indexed by their character grams of length 1 to GRAM_SIZE.
+    An item contained in entries is looked up through its rarest gram and
+    the few candidates are verified; entries contained in the item are found
+    by looking up the item's substrings directly. Neither direction scans
+    the whole vocabulary.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self, vocab: List[str]):
+        self.vocab = vocab
+        self.term_ids: Dict[str, int] = {term: i for i, term in enumerate(vocab)}
+        self.max_len = max((len(term) for term in vocab), default=0)
+        self.grams: Dict[str, List[int]] = {}
+        for term_id, term in enumerate(vocab):
+            for gram in self._grams(term):
+                self.grams.setdefault(gram, []).append(term_id)
+
+    def _grams(self, text: str) -> Set[str]:
+        return {
+            text[i:i + n]
+            for n in range(1, self.GRAM_SIZE + 1)
+            for i in range(len(text) - n + 1)
+        }
+
+    def _containing(self, item: str) -> List[int]:
+        """Term ids of vocabulary entries that contain `item`."""
+        if not item:
+            return list(range(len(self.vocab)))
+        if len(item) <= self.GRAM_SIZE:
+            # The item is itself a gram, so its posting list is exact
+            return self.grams.get(item, [])
+        rarest = min(
+            (self.grams.get(item[i:i + self.GRAM_SIZE], [])
+             for i in range(len(item) - self.GRAM_SIZE + 1)),
+            key=len,
+        )
+        return [term_id for term_id in rarest if item in self.vocab[term_id]]
+
+    def _contained(self, item: str) -> List[int]:
+        """Term ids of vocabulary entries that occur inside `item`."""
+        found = []
+        if "" in self.term_ids:
+            found.append(self.term_ids[""])
+        for i in range(len(item)):
+            for j in range(i + 1, min(len(item), i + self.max_len) + 1):
+                term_id = self.term_ids.get(item[i:j])
+                if term_id is not None:
+                    found.append(term_id)
+        return found
+
+    def match(self, items: Iterable[str]) -> Set[int]:
+        """Returns the term ids matched by any of the (normalized) items."""
+        matched: Set[int] = set()
+        for item in items:
+            matched.update(self._containing(item))
+            matched.update(self._contained(item))
+        return matched
+
+
+class _CatalogTerms(Sequence):
+    """Recipe position -> term ids, read from a column catalog; empty for collapsed duplicates."""
+
+    def __init__(self, catalog, collapsed: Optional[bytearray]):
+        self.catalog = catalog
+        self.collapsed = collapsed
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def __getitem__(self, pos: int) -> Sequence[int]:
+        if self.collapsed is not None and self.collapsed[pos]:
+            return ()
+        return self.catalog.canonical_term_ids(pos)
+
+
+class RecipeIndex:
+    """
+    Inverted index over a recipe catalog.
+
+    Every distinct canonical ingredient gets a term id, and each term id maps
+    to the posting list of recipe positions (indexes into `recipes`) that use
+    it. Built once per catalog so a query only touches recipes that share at
+    least one ingredient with the pantry.
+
+    Canonical names come precomputed from the dataset build
+    (`canonical_ingredients`); a binary catalog even stores the term ids, so
+    loading it does no string work. Older catalogs are canonicalized here.
+
+    With `collapse_duplicates`, only cluster representatives (recipes whose
+    `cluster_id` is their own id, see dedup.py) are indexed; near-duplicates
+    get no terms, so every query scores one recipe per cluster.
+    """
+
+    def __init__(self, recipes: List[Dict], collapse_duplicates: bool = True):
+        self.recipes = recipes
+        self.collapse_duplicates = collapse_duplicates
+        self.duplicates = 0                   # recipes left out as near-duplicates
+        self.vocab: List[str] = []            # term id -> canonical ingredient
+        self.term_ids: Dict[str, int] = {}    # canonical ingredient -> term id
+        self.postings: List[array] = []       # term id -> recipe positions
+        self.recipe_terms: Sequence[Sequence[int]] = []  # recipe position -> term ids
+        self.times: Sequence[float] = []      # recipe position -> cooking time
+        self._positions: Optional[Dict[int, int]] = None
+
+        if hasattr(recipes, "canonical_term_ids"):
+            self._add_mapped(recipes)
+        else:
+            self._add_recipes(recipes)
+
+        self.matcher = SubstringMatcher(self.vocab)
+        self._vector_engine: Optional[VectorEngine] = None
+        self._term_weights: Optional["TermWeights"] = None
+
+    def _add_recipes(self, recipes: Iterable[Dict]) -> None:
+        memo: Dict[str, List[str]] = {}
+        for pos, recipe in enumerate(recipes):
+            self.times.append(recipe['time'])
+            if self.collapse_duplicates and recipe.get('cluster_id', recipe['id']) != recipe['id']:
+                self.duplicates += 1
+                self.recipe_terms.append([])
+                continue
+            names = recipe.get('canonical_ingredients')
+            if names is None:
+                names = canonical_ingredients(recipe['ingredients'], memo)
+            terms = []
+            for name in names:
+                term_id = self.term_ids.get(name)
+                if term_id is None:
+                    term_id = len(self.vocab)
+                    self.term_ids[name] = term_id
+                    self.vocab.append(name)
+                    self.postings.append(array("I"))
+                self.postings[term_id].append(pos)
+                terms.append(term_id)
+            self.recipe_terms.append(terms)
+
+    def _add_mapped(self, catalog) -> None:
+        """
+        Reads term ids straight from a column catalog (see binary_catalog.py).
+        Per-recipe terms stay in the catalog's columns instead of being copied
+        into lists.
+        """
+        self.vocab = list(catalog.terms)
+        self.term_ids = {name: term_id for term_id, name in enumerate(self.vocab)}
+        self.postings = [array("I") for _ in self.vocab]
+        self.times = catalog.times
+        collapsed = bytearray(len(catalog))
+        ids, clusters = catalog.ids, catalog.clusters
+        for pos in range(len(catalog)):
+            if self.collapse_duplicates and clusters[pos] != ids[pos]:
+                self.duplicates += 1
+                collapsed[pos] = 1
+                continue
+            for term_id in catalog.canonical_term_ids(pos):
+                self.postings[term_id].append(pos)
+        self.recipe_terms = _CatalogTerms(catalog, collapsed if self.duplicates else None)
+
+    @property
+    def positions(self) -> Dict[int, int]:
+        """recipe['id'] -> recipe position, built on first use."""
+        if self._positions is None:
+            ids = getattr(self.recipes, "ids", None)
+            if ids is None:
+                ids = (recipe['id'] for recipe in self.recipes)
+            self._positions = {recipe_id: pos for pos, recipe_id in enumerate(ids)}
+        return self._positions
+
+    def __len__(self) -> int:
+        return len(self.recipes)
+
+    def match_terms(self, user_ingredients: List[str]) -> Set[int]:
+        """
+        Returns the term ids matched by the pantry.
+        A term matches when it contains a pantry item or vice versa,
+        e.g. "egg" matches "egg yolk".
+        """
+        items = set()
+        for ingredient in user_ingredients:
+            items.update(split_ingredient(ingredient))
+        return self.matcher.match(items)
+
+    def vector_engine(self) -> VectorEngine:
+        """The NumPy scoring engine for this catalog, built on first use."""
+        if self._vector_engine is None:
+            self._vector_engine = VectorEngine(self)
+        return self._vector_engine
+
+    def term_weights(self, document_frequencies: Optional[List[int]] = None,
+                     total: Optional[int] = None) -> "TermWeights":
+        """
+        The IDF weights for idf scoring, built on first use. Pass document
+        frequencies (per term id) and a recipe total to weigh by a larger
+        catalog instead, e.g. the whole catalog for one shard of it.
+        """
+        if self._term_weights is None or document_frequencies is not None:
+            self._term_weights = TermWeights(self, document_frequencies, total)
+        return self._term_weights
+
+
+ENGINES = ("python", "numpy")
+SCORINGS = ("coverage", "idf")
+
+# Assumed to be on hand: they weigh nothing under idf scoring
+STAPLES = SEASONINGS | {"water"}
+WEIGHT_SCALE = 1000
+
+
+class TermWeights:
+    """
+    IDF weights for idf scoring.
+
+    A term weighs log(N / df), where N is the number of indexed recipes and
+    df the number using the term, so "salt" (in nearly every recipe) is
+    worth next to nothing and "salmon" a lot; STAPLES weigh 0. Weights are
+    stored as integers (thousandths), so sums are exact and both engines
+    compute identical scores. A recipe's idf score is the weight of its
+    matched terms over the weight of all its terms.
+
+    `recipe` holds each recipe's total weight and `floor` the lightest
+    recipe using each term, the bounds MaxScore pruning needs.
+    """
+
+    def __init__(self, index: RecipeIndex, document_frequencies: Optional[List[int]] = None,
+                 total: Optional[int] = None):
+        if document_frequencies is None:
+            document_frequencies = [len(postings) for postings in index.postings]
+        if total is None:
+            total = len(index) - index.duplicates
+        self.term: List[int] = [
+            0 if name in STAPLES or not df else round(WEIGHT_SCALE * math.log(max(total / df, 1.0)))
+            for name, df in zip(index.vocab, document_frequencies)
+        ]
+        self.recipe: List[int] = [sum(self.term[t] for t in terms) for terms in index.recipe_terms]
+        self.floor: List[int] = [min((self.recipe[pos] for pos in postings), default=0)
+                                 for postings in index.postings]
+
+    def score(self, terms: Iterable[int], matched: Set[int], pos: int) -> float:
+        total = self.recipe[pos]
+        return sum(self.term[t] for t in terms if t in matched) / total if total else 0.0
+
+
+def recipe_score(index: RecipeIndex, pos: int, matched: Set[int], scoring: str = "coverage") -> float:
+    """Match score of the recipe at `pos`: matched share of its ingredients, by count or by weight."""
+    terms = index.recipe_terms[pos]
+    if scoring == "idf":
+        return index.term_weights().score(terms, matched, pos)
+    return sum(1 for t in terms if t in matched) / len(terms) if terms else 0.0
+
+
+class MatchResults:
+    """
+    Lazy, paginated view over a ranked query.
+
+    Only recipe positions are kept; the best k are selected on demand (heap
+    top-k, or argpartition for the NumPy engine) and full result dicts with
+    matching/missing ingredients are built just for the rows that are read.
+    Slicing acts as the cursor: `results[:24]` after `results[:12]` extends
+    the ranked prefix instead of re-ranking from scratch for every row.
+    Safe to share between sessions (e.g. through the result cache).
+    """
+
+    def __init__(self, index: RecipeIndex, matched: Set[int], total: int,
+                 ranker: Callable[[int], List[int]], scoring: str = "coverage"):
+        self.index = index
+        self.matched = matched
+        self.scoring = scoring
+        self._total = total
+        self._ranker = ranker
+        self._order: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._total
+
+    def positions(self, stop: int) -> List[int]:
+        """Recipe positions of the best `stop` results, best first."""
+        stop = min(stop, self._total)
+        if stop > len(self._order):
+            with self._lock, span("top_k"):
+                if stop > len(self._order):
+                    # Grow geometrically so repeated "Load More" stays cheap
+                    self._order = self._ranker(min(self._total, max(stop, 2 * len(self._order))))
+        return self._order[:stop]
+
+    def page(self, start: int, stop: int) -> List[Dict]:
+        """Materializes results `start` to `stop` (exclusive)."""
+        positions = self.positions(stop)[start:]
+        with span("materialize"):
+            return [_scored_copy(self.index, pos, self.matched, self.scoring) for pos in positions]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._total)
+            if step != 1:
+                return self.page(0, self._total)[key]
+            return self.page(start, max(start, stop))
+        if key < 0:
+            key += self._total
+        if not 0 <= key < self._total:
+            raise IndexError("match index out of range")
+        return self.page(key, key + 1)[0]
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.page(0, self._total))
+
+
+def rank_matches(user_ingredients: List[str], recipes: List[Dict],
+                 index: Optional[RecipeIndex] = None,
+                 engine: str = "python",
+                 candidates: Optional[int] = None,
+                 scoring: str = "coverage",
+                 min_score: float = 0.0) -> MatchResults:
+    """
+    Scores recipes based on ingredient coverage and returns a lazy ranked view.
+
+    `index` is the prebuilt catalog index; `recipes` may be any subset of the
+    indexed catalog (e.g. after filtering). Without an index one is built for
+    `recipes` on the fly. `candidates` is an optional bitset over catalog
+    positions (see facets.py) and takes the place of passing a filtered
+    `recipes` list. `engine` picks pure-Python or NumPy scoring; both
+    return the same ordering.
+
+    `scoring` is "coverage" (share of the recipe's ingredients on hand) or
+    "idf" (the same share weighted by TermWeights, so staples count for
+    little); recipes scoring below `min_score` are left out.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+    if scoring not in SCORINGS:
+        raise ValueError(f"Unknown scoring {scoring!r}, expected one of {SCORINGS}")
+    if index is None:
+        index = RecipeIndex(recipes)
+    if candidates is None and recipes is not index.recipes:
+        candidates = mask_from_positions((index.positions[r['id']] for r in recipes), len(index))
+
+    matched = index.match_terms(user_ingredients)
+
+    if engine == "numpy":
+        vectors = index.vector_engine()
+        mask = None
+        if candidates is not None:
+            mask = vectors.candidate_mask(candidates)
+        weights = index.term_weights() if scoring == "idf" else None
+        positions, neg_scores = vectors.select(matched, mask, weights, min_score)
+        count("recipes_scanned", len(index))
+        count("matches", len(positions))
+        return MatchResults(index, matched, len(positions),
+                            lambda k: vectors.top(positions, neg_scores, k).tolist(), scoring)
+
+    bits = None if candidates is None else mask_to_bytes(candidates, len(index))
+    if scoring == "idf":
+        scores = _weighted_scores(index, matched, bits, min_score)
+    else:
+        scores = _coverage_scores(index, matched, bits, min_score)
+    count("matches", len(scores))
+
+    # Sort by match score (desc), then time (asc), then catalog order
+    def sort_key(pos: int):
+        return (-scores[pos], index.times[pos], pos)
+
+    return MatchResults(index, matched, len(scores),
+                        lambda k: heapq.nsmallest(k, scores, key=sort_key), scoring)
+
+
+def _coverage_scores(index: RecipeIndex, matched: Set[int], bits: Optional[bytes],
+                     min_score: float) -> Dict[int, float]:
+    """Coverage score of every recipe with a match, visiting only the matched terms' posting lists."""
+    counts: Dict[int, int] = {}
+    if bits is None:
+        for term_id in matched:
+            for pos in index.postings[term_id]:
+                counts[pos] = counts.get(pos, 0) + 1
+    else:
+        for term_id in matched:
+            for pos in index.postings[term_id]:
+                if bits[pos >> 3] >> (pos & 7) & 1:
+                    counts[pos] = counts.get(pos, 0) + 1
+    count("recipes_scanned", sum(len(index.postings[term_id]) for term_id in matched))
+
+    terms = index.recipe_terms
+    scores = {pos: n / len(terms[pos]) for pos, n in counts.items()}
+    if min_score > 0:
+        scores = {pos: score for pos, score in scores.items() if score >= min_score}
+    return scores
+
+
+def _weighted_scores(index: RecipeIndex, matched: Set[int], bits: Optional[bytes],
+                     min_score: float) -> Dict[int, float]:
+    """
+    Idf score of every recipe with a positive score of at least `min_score`,
+    with MaxScore pruning.
+
+    Matched terms are taken lightest first into a "non-essential" set for as
+    long as no recipe reachable through those terms alone could reach
+    `min_score`: their combined weight over the lightest recipe using any of
+    them stays below it (zero-weight terms never make a recipe match). Only
+    the essential terms' posting lists are walked to find candidates; the
+    non-essential weight of each candidate is then looked up in its own term
+    list, skipping candidates that cannot reach `min_score` even with all of
+    it. So "salt" and "pepper" in a pantry no longer touch nearly every
+    recipe in the catalog.
+    """
+    weights = index.term_weights()
+    term, recipe = weights.term, weights.recipe
+    # With catalog-wide weights (a shard, see sharded_engine.py) a weighted
+    # term may have no recipes here, and so no floor
+    ordered = sorted((t for t in matched if index.postings[t]), key=lambda t: (term[t], t))
+    bound, floor, split = 0, math.inf, 0
+    for term_id in ordered:
+        if term[term_id]:
+            floor = min(floor, weights.floor[term_id])
+            if (bound + term[term_id]) / floor >= min_score:
+                break
+            bound += term[term_id]
+        split += 1
+    essential, optional = ordered[split:], set(ordered[:split])
+
+    found: Dict[int, int] = {}
+    for term_id in essential:
+        weight = term[term_id]
+        for pos in index.postings[term_id]:
+            if bits is None or bits[pos >> 3] >> (pos & 7) & 1:
+                found[pos] = found.get(pos, 0) + weight
+    count("recipes_scanned", sum(len(index.postings[term_id]) for term_id in essential))
+
+    scores: Dict[int, float] = {}
+    for pos, weight in found.items():
+        total = recipe[pos]
+        if optional:
+            if (weight + bound) / total < min_score:
+                continue
+            weight += sum(term[t] for t in index.recipe_terms[pos] if t in optional)
+        if weight and weight / total >= min_score:
+            scores[pos] = weight / total
+    return scores
+
+
+class IncrementalRanker:
+    """
+    Per-session alternative to `rank_matches` for a pantry edited one item at
+    a time.
+
+    Keeps, for the current pantry, the matched-term count of every recipe,
+    the recipes grouped by match score, and the bitset of matching recipes.
+    When the pantry changes only the posting lists of terms matched by the
+    added or removed items are visited, each recipe is regrouped once per
+    edit, and ranking reads the best score groups until it has enough rows,
+    so an update costs time proportional to those ingredients' popularity
+    rather than to the catalog size. An edit touching more postings than
+    FALLBACK_SHARE of the catalog (a broad item such as "e") drops that
+    state and ranks with `rank_matches` instead, which is cheaper there;
+    the next smaller edit rebuilds it. Results (and their order) are
+    identical to `rank_matches`.
+    """
+
+    FALLBACK_SHARE = 1.0
+
+    def __init__(self, index: RecipeIndex):
+        self.index = index
+        self.items: Dict[str, Set[int]] = {}   # canonical pantry item -> matched term ids
+        self.term_refs: Dict[int, int] = {}    # matched term id -> items matching it
+        self.counts: Dict[int, int] = {}       # recipe position -> matched terms
+        self.groups: Dict[float, Set[int]] = {}  # match score -> recipe positions
+        self.bits = bytearray((len(index) + 7) // 8)  # bitset of recipes with a match
+        self.stale = False                     # counts/groups/bits not kept for this pantry
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def _score(self, pos: int, count: int) -> float:
+        return count / len(self.index.recipe_terms[pos])
+
+    def _reset(self) -> None:
+        self.counts.clear()
+        self.groups.clear()
+        self.bits = bytearray(len(self.bits))
+
+    def _apply(self, steps: Dict[int, int]) -> None:
+        """Adds each term's step (+1 or -1) to the count of every recipe using it."""
+        postings = self.index.postings
+        deltas: Dict[int, int] = {}
+        for term_id, step in steps.items():
+            for pos in postings[term_id]:
+                deltas[pos] = deltas.get(pos, 0) + step
+        bits, counts, groups = self.bits, self.counts, self.groups
+        for pos, delta in deltas.items():
+            if not delta:
+                continue
+            old = counts.get(pos, 0)
+            new = old + delta
+            if old:
+                score = self._score(pos, old)
+                group = groups[score]
+                group.discard(pos)
+                if not group:
+                    del groups[score]
+            else:
+                bits[pos >> 3] |= 1 << (pos & 7)
+            if new:
+                counts[pos] = new
+                groups.setdefault(self._score(pos, new), set()).add(pos)
+            else:
+                del counts[pos]
+                bits[pos >> 3] &= ~(1 << (pos & 7)) & 0xFF
+
+    def update(self, user_ingredients: List[str]) -> None:
+        """Moves the pantry to `user_ingredients`, applying only the difference."""
+        items = set()
+        for ingredient in user_ingredients:
+            items.update(split_ingredient(ingredient))
+        with self._lock:
+            steps: Dict[int, int] = {}
+            for item in [item for item in self.items if item not in items]:
+                for term_id in self.items.pop(item):
+                    self.term_refs[term_id] -= 1
+                    if not self.term_refs[term_id]:
+                        del self.term_refs[term_id]
+                        steps[term_id] = steps.get(term_id, 0) - 1
+            for item in items.difference(self.items):
+                terms = self.items[item] = self.index.matcher.match([item])
+                for term_id in terms:
+                    self.term_refs[term_id] = self.term_refs.get(term_id, 0) + 1
+                    if self.term_refs[term_id] == 1:
+                        steps[term_id] = steps.get(term_id, 0) + 1
+            steps = {term_id: step for term_id, step in steps.items() if step}
+            if not steps:
+                return
+            self.version += 1
+            volume = sum(len(self.index.postings[term_id]) for term_id in steps)
+            if volume > self.FALLBACK_SHARE * len(self.index):
+                self.stale = True
+                self._reset()
+                return
+            if self.stale:
+                # Nothing is kept for the current pantry; start over from it
+                self.stale = False
+                steps = dict.fromkeys(self.term_refs, 1)
+                volume = sum(len(self.index.postings[term_id]) for term_id in steps)
+            count("recipes_scanned", volume)
+            self._apply(steps)
+
+    def _top(self, k: int, bits: Optional[bytes]) -> List[int]:
+        """Best `k` positions, reading score groups from the top down."""
+        times = self.index.times
+        order: List[int] = []
+        for score in sorted(self.groups, reverse=True):
+            group = self.groups[score]
+            if bits is not None:
+                group = [pos for pos in group if bits[pos >> 3] >> (pos & 7) & 1]
+            # Within a score, shorter time first, then catalog order
+            order.extend(heapq.nsmallest(k - len(order), group,
+                                         key=lambda pos: (times[pos], pos)))
+            if len(order) >= k:
+                break
+        return order
+
+    def rank(self, user_ingredients: List[str], candidates: Optional[int] = None) -> MatchResults:
+        """Same as `rank_matches(user_ingredients, index.recipes, index, candidates=...)`."""
+        pantry = list(user_ingredients)
+        self.update(pantry)
+        with self._lock:
+            stale = self.stale
+            if not stale:
+                version = self.version
+                matched = set(self.term_refs)
+                if candidates is None:
+                    total, bits = len(self.counts), None
+                else:
+                    total = (int.from_bytes(self.bits, "little") & candidates).bit_count()
+                    bits = mask_to_bytes(candidates, len(self.index))
+        if stale:
+            return rank_matches(pantry, self.index.recipes, self.index, candidates=candidates)
+        count("matches", total)
+
+        def ranker(k: int) -> List[int]:
+            with self._lock:
+                if self.version == version:
+                    return self._top(k, bits)
+            # The pantry moved on since (e.g. "Load More" on a cached result)
+            return rank_matches(pantry, self.index.recipes, self.index,
+                                candidates=candidates).positions(k)
+
+        return MatchResults(self.index, matched, total, ranker)
+
+
+def find_matches(user_ingredients: List[str], recipes: List[Dict],
+                 index: Optional[RecipeIndex] = None, engine: str = "python",
+                 limit: Optional[int] = None) -> List[Dict]:
+    """
+    Ranks recipes based on ingredient coverage.
+    Returns recipes with match_score attached.
+
+    Eager form of `rank_matches`; `limit` keeps only the best results.
+    """
+    results = rank_matches(user_ingredients, recipes, index, engine)
+    return results[:limit]
+
+
+def match_fields(index: RecipeIndex, pos: int, matched: Set[int],
+                 scoring: str = "coverage") -> Dict:
+    """The match_score, missing and matching ingredients of the recipe at `pos`."""
+    terms = index.recipe_terms[pos]
+    return {
+        'match_score': recipe_score(index, pos, matched, scoring),
+        'missing_ingredients': [index.vocab[t] for t in terms if t not in matched],
+        'matching_ingredients': [index.vocab[t] for t in terms if t in matched],
+    }
+
+
+def _scored_copy(index: RecipeIndex, pos: int, matched: Set[int],
+                 scoring: str = "coverage") -> Dict:
+    """Copies the recipe at `pos` with its match fields attached for display."""
+    recipe_copy = index.recipes[pos].copy()
+    recipe_copy.update(match_fields(index, pos, matched, scoring))
+    return recipe_copy
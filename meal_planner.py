@@ -0,0 +1,204 @@
+"""
+Weekly meal planning.
+
+Picks `size` recipes from the filtered catalog that together use as much of
+the pantry as possible while needing as few distinct ingredients to buy. A
+plan is scored as
+
+    cost = len(shopping list) - REUSE_WEIGHT * len(pantry ingredients used)
+
+with the plan's total match score breaking ties. A greedy set-cover pass
+builds the first plan, each step adding the recipe whose missing
+ingredients grow the shopping list least; swap-based local search then
+improves it until no swap helps or the time limit runs out. The search is
+anytime: the best plan found so far is returned, flagged incomplete when
+time ran out.
+
+Candidates are the best-matching recipes of the ranked query plus, through
+the inverted index, recipes that use ingredients already on the shopping
+list, so even a very large catalog is never scanned.
+"""
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from facets import mask_to_bytes
+from matcher import MatchResults, RecipeIndex
+
+REUSE_WEIGHT = 0.5
+POOL_SIZE = 300        # best-matching recipes considered
+NEIGHBORS = 40         # recipes pulled in per ingredient on the shopping list
+DEFAULT_SIZE = 7
+MAX_SIZE = 14          # two weeks, the most the app offers
+DEFAULT_TIME_LIMIT = 0.3
+MAX_TIME_LIMIT = 2.0   # seconds a single request may keep the planner busy
+
+
+class _Plan:
+    """Chosen recipes with per-ingredient use counts, for O(ingredients) moves."""
+
+    def __init__(self, planner: "_Planner"):
+        self.planner = planner
+        self.chosen: List[int] = []
+        self.need: Dict[int, int] = {}   # missing term id -> recipes needing it
+        self.used: Dict[int, int] = {}   # pantry term id -> recipes using it
+        self.score = 0.0
+
+    def objective(self) -> Tuple[float, float]:
+        return len(self.need) - REUSE_WEIGHT * len(self.used), -self.score
+
+    def add_delta(self, pos: int, removed: Optional[int] = None) -> Tuple[float, float]:
+        """Change in objective from adding `pos` (after removing `removed`)."""
+        have, missing, score = self.planner.split(pos)
+        gone_have, gone_missing, gone_score = (
+            self.planner.split(removed) if removed is not None else ((), (), 0.0))
+        new_need = sum(1 for t in missing if self.need.get(t, 0) - (t in gone_missing) <= 0)
+        new_used = sum(1 for t in have if self.used.get(t, 0) - (t in gone_have) <= 0)
+        return new_need - REUSE_WEIGHT * new_used, gone_score - score
+
+    def remove_delta(self, pos: int) -> Tuple[float, float]:
+        have, missing, score = self.planner.split(pos)
+        freed = sum(1 for t in missing if self.need[t] == 1)
+        lost = sum(1 for t in have if self.used[t] == 1)
+        return REUSE_WEIGHT * lost - freed, score
+
+    def add(self, pos: int) -> None:
+        have, missing, score = self.planner.split(pos)
+        self.chosen.append(pos)
+        for t in missing:
+            self.need[t] = self.need.get(t, 0) + 1
+        for t in have:
+            self.used[t] = self.used.get(t, 0) + 1
+        self.score += score
+
+    def remove(self, pos: int) -> None:
+        have, missing, score = self.planner.split(pos)
+        self.chosen.remove(pos)
+        for counts, terms in ((self.need, missing), (self.used, have)):
+            for t in terms:
+                counts[t] -= 1
+                if not counts[t]:
+                    del counts[t]
+        self.score -= score
+
+
+class _Planner:
+    def __init__(self, index: RecipeIndex, results: MatchResults, candidates: Optional[int],
+                 deadline: float):
+        self.index = index
+        self.matched = results.matched
+        self.bits = None if candidates is None else mask_to_bytes(candidates, len(index))
+        self.deadline = deadline
+        self._splits: Dict[int, Tuple[frozenset, frozenset, float]] = {}
+        # Candidate pool in rank order; dict keys keep it ordered and unique
+        self.pool: Dict[int, None] = dict.fromkeys(results.positions(POOL_SIZE))
+
+    def out_of_time(self) -> bool:
+        return time.perf_counter() >= self.deadline
+
+    def allowed(self, pos: int) -> bool:
+        return self.bits is None or bool(self.bits[pos >> 3] >> (pos & 7) & 1)
+
+    def split(self, pos: int) -> Tuple[frozenset, frozenset, float]:
+        """(pantry term ids, missing term ids, match score) of a recipe."""
+        entry = self._splits.get(pos)
+        if entry is None:
+            terms = self.index.recipe_terms[pos]
+            have = frozenset(t for t in terms if t in self.matched)
+            missing = frozenset(t for t in terms if t not in self.matched)
+            entry = self._splits[pos] = (have, missing, len(have) / len(terms) if terms else 0.0)
+        return entry
+
+    def expand(self, terms: Iterable[int]) -> None:
+        """Adds recipes that also use these (already bought) ingredients."""
+        for t in terms:
+            found = 0
+            for pos in self.index.postings[t]:
+                if found >= NEIGHBORS:
+                    break
+                if self.allowed(pos):
+                    self.pool.setdefault(pos)
+                    found += 1
+
+    def fill(self, size: int) -> None:
+        """Tops up a pool smaller than the plan with filtered recipes in catalog order."""
+        for pos in range(len(self.index)):
+            if len(self.pool) >= size:
+                return
+            if self.allowed(pos) and self.index.recipe_terms[pos]:
+                self.pool.setdefault(pos)
+
+    def greedy(self, plan: _Plan, size: int) -> None:
+        while len(plan.chosen) < size:
+            rest = [pos for pos in self.pool if pos not in plan.chosen]
+            if not rest:
+                return
+            if self.out_of_time():
+                # Out of time: finish with the best-ranked remaining recipes
+                for pos in rest[:size - len(plan.chosen)]:
+                    plan.add(pos)
+                return
+            best = min(rest, key=lambda pos: (plan.add_delta(pos), self.index.times[pos], pos))
+            plan.add(best)
+            self.expand(self.split(best)[1])
+
+    def improve(self, plan: _Plan) -> bool:
+        """Swap local search; True if it converged before the deadline."""
+        improved = True
+        while improved:
+            improved = False
+            for old in list(plan.chosen):
+                removal = plan.remove_delta(old)
+                best, best_delta = None, None
+                for pos in list(self.pool):
+                    if self.out_of_time():
+                        return False
+                    if pos in plan.chosen:
+                        continue
+                    added = plan.add_delta(pos, removed=old)
+                    delta = (removal[0] + added[0], removal[1] + added[1])
+                    if _better(delta) and (best_delta is None or delta < best_delta):
+                        best, best_delta = pos, delta
+                if best is not None:
+                    plan.remove(old)
+                    plan.add(best)
+                    self.expand(self.split(best)[1])
+                    improved = True
+        return True
+
+
+def _better(delta: Tuple[float, float]) -> bool:
+    """True if an objective change is an improvement (scores are floats)."""
+    cost, score = delta
+    return cost < -1e-9 or (abs(cost) <= 1e-9 and score < -1e-9)
+
+
+def plan_meals(index: RecipeIndex, results: MatchResults, candidates: Optional[int] = None,
+               size: int = DEFAULT_SIZE, time_limit: float = DEFAULT_TIME_LIMIT) -> Dict:
+    """
+    Plans `size` recipes for a pantry.
+
+    `results` is the ranked query for the pantry (it supplies the matched
+    terms and the best matches to start from); `candidates` is the facet
+    bitset of recipes passing the filters. Returns recipe positions in plan
+    order, the shopping list and pantry ingredients used (canonical names,
+    most shared first), the cost, and whether the search finished within
+    `time_limit` seconds.
+    """
+    started = time.perf_counter()
+    planner = _Planner(index, results, candidates, started + time_limit)
+    planner.fill(size)
+    plan = _Plan(planner)
+    planner.greedy(plan, size)
+    complete = planner.improve(plan)
+
+    def by_use(counts: Dict[int, int]) -> List[str]:
+        return [index.vocab[t] for t in sorted(counts, key=lambda t: (-counts[t], index.vocab[t]))]
+
+    return {
+        "positions": plan.chosen,
+        "shopping_list": by_use(plan.need),
+        "pantry_used": by_use(plan.used),
+        "cost": plan.objective()[0],
+        "complete": complete,
+        "elapsed": time.perf_counter() - started,
+    }
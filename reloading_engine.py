@@ -0,0 +1,187 @@
+"""
+Catalog hot reload.
+
+ReloadingEngine serves queries from a MatchEngine and polls the catalog
+files in a background thread. When their modification time or size
+changes, and then holds still for one more poll (so a build that is still
+writing is not picked up half-way), a new MatchEngine is built on that
+thread and swapped in with a single reference assignment:
+
+- queries never wait for a rebuild; each call works on the engine that
+  was current when it started, so in-flight queries finish on the old
+  catalog while new ones already see the rebuilt one;
+- each generation has its own result cache, so cached results never mix
+  catalogs;
+- the old catalog and its index are released once the last in-flight
+  query and session ranker holding them are gone (a memory-mapped catalog
+  is unmapped then); the `catalog_retired_alive` gauge counts those still
+  held.
+
+A rebuild that fails, whatever the error (e.g. a truncated JSON or binary
+file), keeps the current catalog and is retried on the next change.
+
+Usage:
+    engine = ReloadingEngine(interval=5.0)
+    engine.query({"pantry": ["egg", "tomato"]})
+"""
+import os
+import sys
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional
+
+from engine import CATALOG_BIN, CATALOG_JSON, MatchEngine, load_catalog
+from instrumentation import count, span
+from matcher import IncrementalRanker, MatchResults, RecipeIndex
+from result_cache import ResultCache
+
+DEFAULT_INTERVAL = 5.0
+
+
+class ReloadingEngine:
+    """
+    Same query API as MatchEngine, over the catalog files as they are now.
+    `interval` is the polling period in seconds (0 disables watching; call
+    `reload()` directly).
+    """
+
+    def __init__(self, json_path: str = CATALOG_JSON, bin_path: str = CATALOG_BIN,
+                 scoring_engine: str = "python", interval: float = DEFAULT_INTERVAL,
+                 cache_size: int = 256, cache_ttl: Optional[float] = 600.0,
+                 scoring: str = "coverage", min_score: float = 0.0):
+        self.json_path = json_path
+        self.bin_path = bin_path
+        self.scoring_engine = scoring_engine
+        self.scoring = scoring
+        self.min_score = min_score
+        self.interval = interval
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.generation = 1
+        self._lock = threading.Lock()                # serializes reloads, not queries
+        self._retired = weakref.WeakSet()             # replaced catalog indexes still referenced somewhere
+        self._loaded = self._fingerprint()
+        self._engine = self._build()
+        self._stopped = threading.Event()
+        self._thread = None
+        if interval > 0:
+            self._thread = threading.Thread(target=self._watch, name="mealprep-reload", daemon=True)
+            self._thread.start()
+
+    def _fingerprint(self):
+        """(mtime, size) of each catalog file, None for a missing one."""
+        stats = []
+        for path in (self.json_path, self.bin_path):
+            try:
+                st = os.stat(path)
+                stats.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+        return tuple(stats)
+
+    def _build(self) -> MatchEngine:
+        return MatchEngine(load_catalog(self.json_path, self.bin_path),
+                           scoring_engine=self.scoring_engine,
+                           cache=ResultCache(self.cache_size, self.cache_ttl),
+                           scoring=self.scoring, min_score=self.min_score)
+
+    def _watch(self) -> None:
+        pending = None
+        while not self._stopped.wait(self.interval):
+            try:
+                current = self._fingerprint()
+                if current == self._loaded:
+                    pending = None
+                elif current != pending:
+                    pending = current   # changed; wait one poll for the writer to finish
+                else:
+                    self.reload()
+                    pending = None
+            except Exception as e:
+                # Keep watching whatever happens, or no later rebuild is picked up
+                print(f"[{os.getpid()}] Catalog watch failed: {type(e).__name__}: {e}", file=sys.stderr)
+
+    def reload(self) -> bool:
+        """
+        Rebuilds the engine from the catalog files and swaps it in.
+        Returns False, keeping the current engine, if the rebuild fails.
+        """
+        with self._lock:
+            # Taken before loading: a file replaced mid-load shows up as a
+            # new change on the next poll
+            fingerprint = self._fingerprint()
+            try:
+                with span("reload_catalog"):
+                    engine = self._build()
+            except Exception as e:   # a half-written file fails in many ways; keep serving
+                self._loaded = fingerprint   # do not retry the same files every poll
+                count("catalog_reloads", status="failed")
+                print(f"[{os.getpid()}] Catalog reload failed, keeping generation "
+                      f"{self.generation}: {type(e).__name__}: {e}", file=sys.stderr)
+                return False
+            self._retired.add(self._engine.index)
+            self._engine = engine
+            self._loaded = fingerprint
+            self.generation += 1
+        count("catalog_reloads", status="ok")
+        print(f"[{os.getpid()}] Reloaded catalog: {len(engine.recipes)} recipes "
+              f"(generation {self.generation})", file=sys.stderr)
+        return True
+
+    def close(self) -> None:
+        """Stops watching the catalog files."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "ReloadingEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # --- MatchEngine API, each call on the engine current when it starts ---
+
+    @property
+    def engine(self) -> MatchEngine:
+        return self._engine
+
+    @property
+    def recipes(self):
+        return self._engine.recipes
+
+    @property
+    def index(self) -> RecipeIndex:
+        return self._engine.index
+
+    def info(self) -> Dict:
+        return self._engine.info()
+
+    def gauges(self) -> Dict[str, float]:
+        gauges = self._engine.gauges()
+        gauges["catalog_generation"] = self.generation
+        gauges["catalog_retired_alive"] = len(self._retired)
+        return gauges
+
+    def ranker(self) -> Optional[IncrementalRanker]:
+        """A ranker for the current catalog; rankers of an older one fall back to full ranking."""
+        return self._engine.ranker()
+
+    def search(self, user_ingredients: List[str], cuisines: Optional[Iterable[str]] = None,
+               max_time: Optional[float] = None, diet: str = "All",
+               ranker: Optional[IncrementalRanker] = None) -> MatchResults:
+        return self._engine.search(user_ingredients, cuisines, max_time, diet, ranker)
+
+    def candidates(self, cuisines: Optional[Iterable[str]] = None,
+                   max_time: Optional[float] = None, diet: str = "All") -> int:
+        return self._engine.candidates(cuisines, max_time, diet)
+
+    def query(self, request: Dict, ranker: Optional[IncrementalRanker] = None) -> Dict:
+        return self._engine.query(request, ranker)
+
+    def query_batch(self, requests: List[Dict]) -> List[Dict]:
+        return self._engine.query_batch(requests)
+
+    def plan(self, request: Dict) -> Dict:
+        return self._engine.plan(request)
@@ -0,0 +1,86 @@
+"""
+Process-wide cache of ranked query results.
+
+Keys are canonical: the pantry is canonicalized, deduplicated and sorted,
+and the filters are reduced to a tuple, so "onions, egg" and "eggs, onion"
+share an entry. Entries belong to one catalog index; when a different
+index is passed in (the catalog was reloaded) the cache is emptied.
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from canonicalize import split_ingredient
+
+
+def query_key(user_ingredients: Iterable[str], cuisines: Iterable[str], max_time: float,
+              diet: str, engine: str = "python", scoring: str = "coverage",
+              min_score: float = 0.0) -> Tuple:
+    """Canonical cache key for a pantry plus the sidebar filters and scoring settings."""
+    pantry = tuple(sorted({name for i in user_ingredients for name in split_ingredient(i)}))
+    return (pantry, tuple(sorted(set(cuisines))), max_time, diet, engine, scoring, min_score)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache with a time-to-live, shared by all sessions.
+    Counts hits, misses and evictions for reporting.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, object]]" = OrderedDict()
+        self._index_ref = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _check_index(self, index) -> None:
+        """Drops every entry if `index` is not the one they were computed on."""
+        if self._index_ref is None or self._index_ref() is not index:
+            self._entries.clear()
+            self._index_ref = weakref.ref(index)
+
+    def get_or_compute(self, index, key: Hashable, compute: Callable[[], object]):
+        """Returns the cached value for `key` on `index`, computing it on a miss."""
+        now = time.monotonic()
+        with self._lock:
+            self._check_index(index)
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or now - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Compute outside the lock so slow queries do not block cache hits
+        value = compute()
+
+        with self._lock:
+            self._check_index(index)
+            self._entries[key] = (now, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
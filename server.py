@@ -0,0 +1,207 @@
+"""
+Asyncio HTTP/JSON front end for the matching engine.
+
+The catalog is loaded once per process. Endpoints:
+    GET  /health  -> {"status": "ok"}
+    GET  /info    -> {"recipes": 1000, "cuisines": [...]}
+    POST /match   -> one query (see engine.py), or {"queries": [...]} for a batch
+    POST /plan    -> a weekly meal plan for one query
+    GET  /metrics -> counters and timings in Prometheus text format
+
+Usage:
+    python server.py --port 8600 --workers 4
+
+With --workers > 1 each worker process binds the same port (SO_REUSEPORT)
+and the kernel spreads connections across them. With --shards N each
+worker splits the catalog over N shard processes and answers queries by
+scatter-gather (see sharded_engine.py). Unsharded workers pick up a rebuilt
+catalog without restarting (see reloading_engine.py).
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+from typing import Dict, Optional, Tuple
+
+from engine import CATALOG_BIN, CATALOG_JSON
+from instrumentation import count, prometheus_text, span, start_profiler_from_env
+from matcher import ENGINES, SCORINGS
+from reloading_engine import DEFAULT_INTERVAL, ReloadingEngine
+from sharded_engine import ShardedEngine
+
+MAX_BODY = 1 << 20
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           501: "Not Implemented"}
+ROUTES = ("/health", "/info", "/metrics", "/match", "/plan")
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class MatchServer:
+    """Minimal HTTP/1.1 server (keep-alive, Content-Length bodies) over a MatchEngine-like engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict, bytes]]:
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        # Errors raised before the body is read leave the connection unusable,
+        # so they close it (see handle)
+        if "transfer-encoding" in headers:
+            raise HttpError(411, "Send the body with a Content-Length")
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    def _route(self, method: str, path: str, body: bytes):
+        if path == "/health":
+            return {"status": "ok"}
+        if path == "/info":
+            return self.engine.info()
+        if path == "/metrics":
+            return prometheus_text(self.engine.gauges())
+        if path in ("/match", "/plan"):
+            if method != "POST":
+                raise HttpError(405, f"Use POST for {path}")
+            try:
+                payload = json.loads(body or b"{}")
+            except json.JSONDecodeError as e:
+                raise HttpError(400, f"Invalid JSON: {e}")
+            if not isinstance(payload, dict):
+                raise HttpError(400, "Expected a JSON object")
+            try:
+                if path == "/plan":
+                    return self.engine.plan(payload)
+                if "queries" in payload:
+                    return {"results": self.engine.query_batch(payload["queries"])}
+                return self.engine.query(payload)
+            except (TypeError, ValueError) as e:
+                raise HttpError(400, str(e))
+            except NotImplementedError as e:
+                raise HttpError(501, str(e))
+        raise HttpError(404, f"No route for {path}")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                keep_alive = True
+                request = None
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, path, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    # Matching is CPU-bound; run it off the event loop so other
+                    # connections keep being accepted and parsed
+                    with span("http_request"):
+                        result = await loop.run_in_executor(None, self._route, method, path, body)
+                    status = 200
+                except HttpError as e:
+                    status, result = e.status, {"error": str(e)}
+                    # A request we could not parse leaves the stream unusable
+                    keep_alive = keep_alive and request is not None
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, result = 500, {"error": str(e)}
+
+                if request is not None:
+                    count("http_requests", path=request[1] if request[1] in ROUTES else "other",
+                          status=status)
+                if isinstance(result, str):
+                    payload, content_type = result.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    payload, content_type = json.dumps(result).encode("utf-8"), "application/json"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + payload
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, reuse_port: bool = False):
+        server = await asyncio.start_server(self.handle, host, port, reuse_port=reuse_port or None)
+        async with server:
+            await server.serve_forever()
+
+
+def run_worker(args):
+    start_profiler_from_env()
+    if args.shards > 1:
+        engine = ShardedEngine(args.catalog, args.catalog_bin, shards=args.shards,
+                               scoring_engine=args.engine, scoring=args.scoring,
+                               min_score=args.min_score)
+    else:
+        engine = ReloadingEngine(args.catalog, args.catalog_bin, scoring_engine=args.engine,
+                                 interval=args.reload_interval, scoring=args.scoring,
+                                 min_score=args.min_score)
+    print(f"[{os.getpid()}] Serving {engine.info()['recipes']} recipes on http://{args.host}:{args.port}")
+    asyncio.run(MatchServer(engine).serve(args.host, args.port, reuse_port=args.workers > 1))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve recipe matching over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--workers", type=int, default=1, help="Processes sharing the port")
+    parser.add_argument("--shards", type=int, default=1, help="Catalog shards per worker")
+    parser.add_argument("--engine", choices=ENGINES, default="python", help="Scoring engine")
+    parser.add_argument("--scoring", choices=SCORINGS, default="coverage",
+                        help="Score by share of ingredients (coverage) or of IDF weight (idf)")
+    parser.add_argument("--min-score", type=float, default=0.0, help="Drop matches scoring below this")
+    parser.add_argument("--catalog", default=CATALOG_JSON)
+    parser.add_argument("--catalog-bin", default=CATALOG_BIN)
+    parser.add_argument("--reload-interval", type=float, default=DEFAULT_INTERVAL,
+                        help="Seconds between checks for a rebuilt catalog (0 disables hot reload)")
+    args = parser.parse_args(argv)
+
+    if args.workers <= 1:
+        run_worker(args)
+        return
+    workers = [multiprocessing.Process(target=run_worker, args=(args,)) for _ in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == "__main__":
+    main()
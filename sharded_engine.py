@@ -0,0 +1,285 @@
+"""
+Sharded matching with scatter-gather over local worker processes.
+
+The catalog is split into contiguous position ranges. Each shard is served
+by its own process holding a MatchEngine (index, facets, result cache) over
+its range, so catalog memory and scoring work are spread across cores. A
+query is answered in two rounds:
+
+1. rank: every shard filters and ranks its own recipes and returns its
+   total and the sort keys (-match_score, time, catalog position) of its
+   best offset + limit matches;
+2. rows: the coordinator merges the keys and asks the owning shards to
+   materialize only the rows on the requested page.
+
+Shards are contiguous, so each shard's catalog order agrees with the global
+order and the merged ranking is identical to the unsharded MatchEngine.
+
+Shards memory-map the binary catalog (see binary_catalog.py), so all of
+them share one copy of it; a JSON-only catalog would be loaded whole by
+every shard, so ShardedEngine refuses to start without an up-to-date
+binary file.
+
+Usage:
+    engine = ShardedEngine(shards=4)
+    engine.query({"pantry": ["egg", "tomato"], "limit": 12})
+"""
+import heapq
+import multiprocessing
+import threading
+from bisect import bisect_right
+from collections.abc import Sequence
+from typing import Dict, List
+
+from binary_catalog import MappedCatalog
+from engine import (CATALOG_BIN, CATALOG_JSON, DEFAULT_LIMIT, MatchEngine, binary_is_current,
+                    check_request, parse_cuisines, parse_pantry, parse_queries)
+from instrumentation import span
+from matcher import ENGINES, SCORINGS, match_fields, recipe_score
+
+
+class CatalogShard(Sequence):
+    """Positions `start` to `stop` of a column catalog (see binary_catalog.py), without copying it."""
+
+    def __init__(self, catalog, start: int, stop: int):
+        self.catalog = catalog
+        self.start = start
+        self.stop = stop
+        # What RecipeIndex reads to index term ids directly
+        self.terms = catalog.terms
+        self.ids = catalog.ids[start:stop]
+        self.clusters = catalog.clusters[start:stop]
+        self.times = catalog.times[start:stop]
+
+    def canonical_term_ids(self, pos: int):
+        return self.catalog.canonical_term_ids(self.start + pos)
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, pos: int):
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError("recipe position out of range")
+        return self.catalog[self.start + pos]
+
+
+def shard_bounds(size: int, shards: int, shard: int):
+    """Start and stop position of `shard` when `size` recipes are split `shards` ways."""
+    return size * shard // shards, size * (shard + 1) // shards
+
+
+class _Shard:
+    """Worker-side state: the engine over one catalog range."""
+
+    def __init__(self, bin_path: str, shard: int, shards: int, options: Dict):
+        catalog = MappedCatalog(bin_path)
+        self.start, stop = shard_bounds(len(catalog), shards, shard)
+        self.engine = MatchEngine(CatalogShard(catalog, self.start, stop), **options)
+
+    def _search(self, request: Dict):
+        return self.engine.search(parse_pantry(request.get("pantry")), request.get("cuisines"),
+                                  request.get("max_time"), request.get("diet", "All"))
+
+    def info(self, _=None) -> Dict:
+        return dict(self.engine.info(), start=self.start)
+
+    def gauges(self, _=None) -> Dict:
+        return self.engine.gauges()
+
+    def frequencies(self, _=None) -> Dict:
+        """Indexed recipes and recipes per canonical ingredient, for catalog-wide IDF."""
+        index = self.engine.index
+        return {"total": len(index) - index.duplicates,
+                "df": {name: len(postings) for name, postings in zip(index.vocab, index.postings)}}
+
+    def weigh(self, request: Dict) -> None:
+        """Switches idf scoring to catalog-wide frequencies."""
+        index = self.engine.index
+        index.term_weights([request["df"][name] for name in index.vocab], request["total"])
+
+    def rank(self, request: Dict) -> Dict:
+        """Total and (-score, time, global position) of the best `k` matches."""
+        matches = self._search(request)
+        index = self.engine.index
+        keys = []
+        for pos in matches.positions(request["k"]):
+            score = recipe_score(index, pos, matches.matched, self.engine.scoring)
+            keys.append((-score, index.times[pos], self.start + pos))
+        return {"total": len(matches), "keys": keys}
+
+    def rows(self, request: Dict) -> List[Dict]:
+        """Result dicts for the given global positions."""
+        matches = self._search(request)
+        rows = []
+        for global_pos in request["positions"]:
+            pos = global_pos - self.start
+            recipe = self.engine.recipes[pos].copy()
+            recipe.update(match_fields(self.engine.index, pos, matches.matched, self.engine.scoring))
+            rows.append(recipe)
+        return rows
+
+
+def _serve_shard(conn, bin_path: str, shard: int, shards: int, options: Dict):
+    """Worker loop: answers (operation, payload) messages until told to stop."""
+    try:
+        state = _Shard(bin_path, shard, shards, options)
+    except Exception as e:
+        conn.send(("error", type(e).__name__, str(e)))
+        return
+    conn.send(("ok", None))
+    while True:
+        try:
+            op, payload = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            # Coordinator gone, or Ctrl-C reached the whole process group
+            return
+        if op == "stop":
+            return
+        try:
+            conn.send(("ok", getattr(state, op)(payload)))
+        except Exception as e:
+            conn.send(("error", type(e).__name__, str(e)))
+
+
+class ShardedEngine:
+    """
+    Same query API as MatchEngine, scattered over `shards` worker processes
+    and gathered here. Call `close()` (or use it as a context manager) to
+    stop the workers.
+    """
+
+    def __init__(self, json_path: str = CATALOG_JSON, bin_path: str = CATALOG_BIN,
+                 shards: int = 2, scoring_engine: str = "python", scoring: str = "coverage",
+                 min_score: float = 0.0):
+        if scoring_engine not in ENGINES:
+            raise ValueError(f"Unknown engine {scoring_engine!r}, expected one of {ENGINES}")
+        if scoring not in SCORINGS:
+            raise ValueError(f"Unknown scoring {scoring!r}, expected one of {SCORINGS}")
+        if not binary_is_current(json_path, bin_path):
+            raise FileNotFoundError(
+                f"Sharding needs a binary catalog at least as new as {json_path}; "
+                f"run: python binary_catalog.py {json_path} {bin_path}")
+        self.scoring_engine = scoring_engine
+        self.scoring = scoring
+        options = dict(scoring_engine=scoring_engine, scoring=scoring, min_score=min_score)
+        self._conns = []
+        self._workers = []
+        # One request at a time goes through the pipes; the shards work on it in parallel
+        self._lock = threading.Lock()
+        for shard in range(shards):
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(
+                target=_serve_shard, daemon=True,
+                args=(child, bin_path, shard, shards, options))
+            worker.start()
+            child.close()
+            self._conns.append(parent)
+            self._workers.append(worker)
+        try:
+            self._check([conn.recv() for conn in self._conns])
+            self._infos = self._scatter("info")
+            if scoring == "idf":
+                self._weigh()
+        except Exception:
+            self.close()
+            raise
+        self.starts = [info["start"] for info in self._infos]
+
+    def _check(self, replies: List) -> List:
+        """Unwraps shard replies, re-raising the first error."""
+        for reply in replies:
+            if reply[0] == "error":
+                _, kind, message = reply
+                if kind == "FileNotFoundError":
+                    raise FileNotFoundError(message)
+                if kind in ("ValueError", "TypeError"):
+                    raise ValueError(message)
+                raise RuntimeError(f"Shard failed: {kind}: {message}")
+        return [reply[1] for reply in replies]
+
+    def _scatter(self, op: str, payloads=None) -> List:
+        """Sends `op` to every shard (with its own payload, if given) and gathers the replies."""
+        with self._lock:
+            for i, conn in enumerate(self._conns):
+                conn.send((op, None if payloads is None else payloads[i]))
+            # Read every reply before raising, so the pipes stay in step
+            replies = [conn.recv() for conn in self._conns]
+        return self._check(replies)
+
+    def _weigh(self) -> None:
+        """Gives every shard the catalog-wide document frequencies, so IDF matches the unsharded engine."""
+        total, df = 0, {}
+        for shard in self._scatter("frequencies"):
+            total += shard["total"]
+            for name, n in shard["df"].items():
+                df[name] = df.get(name, 0) + n
+        self._scatter("weigh", [{"total": total, "df": df}] * len(self._conns))
+
+    def _shard_of(self, pos: int) -> int:
+        return bisect_right(self.starts, pos) - 1
+
+    def info(self) -> Dict:
+        cuisines = sorted(set().union(*(info["cuisines"] for info in self._infos)))
+        return {"recipes": sum(info["recipes"] for info in self._infos), "cuisines": cuisines}
+
+    def gauges(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for gauges in self._scatter("gauges"):
+            for name, value in gauges.items():
+                totals[name] = totals.get(name, 0) + value
+        totals["result_cache_hit_rate"] = totals.get("result_cache_hit_rate", 0) / len(self._conns)
+        totals["shards"] = len(self._conns)
+        return totals
+
+    def ranker(self) -> None:
+        """Incremental ranking is not available across shards."""
+        return None
+
+    def query(self, request: Dict, ranker=None) -> Dict:
+        """Answers one JSON-shaped query (see engine.py) by scatter-gather."""
+        # Fail fast, before any shard is asked
+        parse_pantry(check_request(request).get("pantry"))
+        parse_cuisines(request.get("cuisines"))
+        offset = max(0, int(request.get("offset", 0)))
+        limit = max(0, int(request.get("limit", DEFAULT_LIMIT)))
+
+        with span("shard_rank"):
+            ranked = self._scatter("rank", [dict(request, k=offset + limit)] * len(self._conns))
+        total = sum(shard["total"] for shard in ranked)
+        page = list(heapq.merge(*(shard["keys"] for shard in ranked)))[offset:offset + limit]
+
+        # Materialize the page, asking each shard only for its own rows
+        wanted = [[] for _ in self._conns]
+        for _, _, pos in page:
+            wanted[self._shard_of(pos)].append(pos)
+        with span("shard_rows"):
+            rows = self._scatter("rows", [dict(request, positions=positions) for positions in wanted])
+        by_pos = {}
+        for positions, shard_rows in zip(wanted, rows):
+            by_pos.update(zip(positions, shard_rows))
+        return {"total": total, "results": [by_pos[pos] for _, _, pos in page]}
+
+    def query_batch(self, requests: List[Dict]) -> List[Dict]:
+        return [self.query(request) for request in parse_queries(requests)]
+
+    def plan(self, request: Dict) -> Dict:
+        raise NotImplementedError("Meal planning needs the whole catalog; run without shards")
+
+    def close(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+            conn.close()
+        for worker in self._workers:
+            worker.join(timeout=5)
+        self._conns, self._workers = [], []
+
+    def __enter__(self) -> "ShardedEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import download_datasets
+
+BODY = json.dumps({"recipes": [{"id": i, "name": f"recipe {i}"} for i in range(2000)]}).encode()
+ETAG = '"v1"'
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """Serves BODY with an ETag, honouring If-None-Match, Range and If-Range."""
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers))
+        if server.failures:
+            server.failures -= 1
+            self.send_error(503)
+            return
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start, status = 0, 200
+        if "Range" in self.headers and self.headers.get("If-Range", ETAG) == ETAG:
+            start, status = int(self.headers["Range"].split("=")[1].rstrip("-")), 206
+            # A misbehaving server may answer with a range starting elsewhere
+            start = max(0, start - server.range_shift)
+            if start > len(BODY):
+                self.send_error(416)
+                return
+        body = BODY[start:]
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{len(BODY) - 1}/{len(BODY)}")
+        self.end_headers()
+        if server.truncate_at is not None:
+            # Drop the connection part-way through the body
+            self.wfile.write(body[:server.truncate_at])
+            server.truncate_at = None
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(download_datasets, "BACKOFF", 0)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    httpd.requests, httpd.failures, httpd.truncate_at, httpd.range_shift = [], 0, None, 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _source(server):
+    return {"name": "standin", "url": f"http://127.0.0.1:{server.server_port}/recipes.json"}
+
+
+def _downloaded(dest):
+    with open(os.path.join(dest, "raw_standin.json"), "rb") as f:
+        return f.read()
+
+
+def test_unchanged_source_is_skipped(server, tmp_path):
+    sources = [_source(server)]
+    assert download_datasets.download_all(sources, str(tmp_path)) == {"standin": "downloaded"}
+    assert download_datasets.download_all(sources, str(tmp_path)) == {"standin": "unchanged"}
+    assert server.requests[-1]["If-None-Match"] == ETAG
+    assert _downloaded(tmp_path) == BODY
+
+
+def test_transient_errors_are_retried(server, tmp_path):
+    server.failures = 2
+    status, entry = download_datasets.download_file(_source(server), str(tmp_path))
+    assert status == "downloaded" and entry["size"] == len(BODY)
+    assert len(server.requests) == 3
+    assert _downloaded(tmp_path) == BODY
+
+
+def test_truncated_body_resumes_with_range(server, tmp_path):
+    server.truncate_at = 1000
+    download_datasets.download_file(_source(server), str(tmp_path))
+    assert len(server.requests) == 2
+    assert server.requests[1]["Range"] == "bytes=1000-"
+    assert server.requests[1]["If-Range"] == ETAG
+    assert _downloaded(tmp_path) == BODY
+    assert not os.path.exists(os.path.join(tmp_path, "raw_standin.json.part"))
+
+
+def test_changed_file_restarts_instead_of_resuming(server, tmp_path):
+    # A partial download of an older version of the file
+    part = os.path.join(tmp_path, "raw_standin.json.part")
+    with open(part, "wb") as f:
+        f.write(b"stale bytes")
+    with open(part + ".json", "w", encoding="utf-8") as f:
+        json.dump({"etag": '"v0"', "last_modified": None}, f)
+    download_datasets.download_file(_source(server), str(tmp_path))
+    assert server.requests[0]["If-Range"] == '"v0"'
+    assert _downloaded(tmp_path) == BODY
+
+
+def test_misaligned_range_restarts(server, tmp_path):
+    server.truncate_at, server.range_shift = 1000, 10
+    download_datasets.download_file(_source(server), str(tmp_path))
+    # The resumed range starts at 990, so the partial file is dropped
+    assert len(server.requests) == 3
+    assert "Range" not in server.requests[2]
+    assert _downloaded(tmp_path) == BODY
+
+
+def test_range_from_zero_overwrites_partial(server, tmp_path):
+    server.truncate_at, server.range_shift = 1000, 1000
+    download_datasets.download_file(_source(server), str(tmp_path))
+    assert len(server.requests) == 2
+    assert _downloaded(tmp_path) == BODY
+
+
+def test_unsatisfiable_range_discards_metadata(server, tmp_path):
+    part = os.path.join(tmp_path, "raw_standin.json.part")
+    with open(part, "wb") as f:
+        f.write(b"x" * (len(BODY) + 10))
+    with open(part + ".json", "w", encoding="utf-8") as f:
+        json.dump({"etag": ETAG, "last_modified": None}, f)
+    download_datasets.download_file(_source(server), str(tmp_path))
+    assert "Range" not in server.requests[-1]
+    assert _downloaded(tmp_path) == BODY
+    assert not os.path.exists(part + ".json")
@@ -0,0 +1,30 @@
+import json
+import os
+import random
+
+from facets import CatalogFacets
+from matcher import IncrementalRanker, RecipeIndex, rank_matches
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_incremental_matches_full_ranking():
+    with open(os.path.join(ROOT, "data", "recipes.json"), encoding="utf-8") as f:
+        recipes = json.load(f)
+    index, facets = RecipeIndex(recipes), CatalogFacets(recipes)
+    ranker = IncrementalRanker(index)
+    rng = random.Random(1)
+    # Single letters match most of the vocabulary, exercising the fallback
+    words = index.vocab[:200] + ["egg", "rice", "salt and pepper", "e", "a"]
+    pantry = []
+    for _ in range(300):
+        if pantry and rng.random() < 0.45:
+            pantry.pop(rng.randrange(len(pantry)))
+        else:
+            pantry.append(rng.choice(words))
+        candidates = None if rng.random() < 0.5 else facets.select(
+            rng.sample(facets.cuisines, 3), rng.choice([30, 60, float("inf")]), "All")
+        expected = rank_matches(pantry, recipes, index, candidates=candidates)
+        actual = ranker.rank(pantry, candidates)
+        assert len(actual) == len(expected)
+        assert actual.positions(40) == expected.positions(40)
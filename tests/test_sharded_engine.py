@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from binary_catalog import write_catalog
+from engine import MatchEngine, load_catalog
+from json_stream import iter_json_list
+from sharded_engine import ShardedEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG = os.path.join(ROOT, "data", "recipes.json")
+PANTRIES = (["salt"], ["egg", "tomato"], ["chicken", "rice", "onion"], ["e"])
+
+
+def _ranking(response):
+    return response["total"], [(r["id"], r["match_score"]) for r in response["results"]]
+
+
+@pytest.mark.parametrize("scoring,min_score", [("coverage", 0.0), ("idf", 0.0), ("idf", 0.2)])
+def test_sharded_matches_unsharded(tmp_path, scoring, min_score):
+    bin_path = str(tmp_path / "recipes.bin")
+    write_catalog(iter_json_list(CATALOG), bin_path)
+    single = MatchEngine(load_catalog(CATALOG, str(tmp_path / "missing.bin")),
+                         scoring=scoring, min_score=min_score)
+    with ShardedEngine(CATALOG, bin_path, shards=3,
+                       scoring=scoring, min_score=min_score) as sharded:
+        for pantry in PANTRIES:
+            request = {"pantry": pantry, "offset": 2, "limit": 20}
+            assert _ranking(sharded.query(request)) == _ranking(single.query(request))
+
+
+def test_sharding_requires_binary_catalog(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ShardedEngine(CATALOG, str(tmp_path / "missing.bin"), shards=2)
@@ -0,0 +1,132 @@
+"""
+Vectorized scoring engine backed by NumPy.
+
+The catalog is stored as a CSR recipe x ingredient incidence matrix, so the
+match count of every recipe is one sparse matrix-vector product against the
+pantry's matched-term mask (or matched-term weights, for idf scoring).
+Scores, the `score > 0` cut and the (-match_score, time) ordering are all
+computed in NumPy.
+"""
+from itertools import chain
+from typing import List, Optional, Set
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; only this engine needs it
+    np = None
+
+
+class VectorEngine:
+    """CSR view of a RecipeIndex for vectorized scoring."""
+
+    # Memory budget for the (nonzeros x queries) hit matrix of scores_many
+    BATCH_BYTES = 64 << 20
+
+    def __init__(self, index):
+        if np is None:
+            raise ImportError("The numpy engine requires numpy (pip install numpy)")
+        self.num_terms = len(index.vocab)
+        self.lengths = np.fromiter((len(t) for t in index.recipe_terms), dtype=np.int64,
+                                   count=len(index.recipe_terms))
+        self.indptr = np.zeros(len(self.lengths) + 1, dtype=np.int64)
+        np.cumsum(self.lengths, out=self.indptr[1:])
+        self.indices = np.fromiter(chain.from_iterable(index.recipe_terms), dtype=np.int32,
+                                   count=int(self.indptr[-1]))
+        self.times = np.asarray(index.times, dtype=np.float64)
+        self._weight_source = None
+
+    def candidate_mask(self, candidates: int):
+        """Boolean mask over recipe positions from a facets.py bitset."""
+        size = len(self.lengths)
+        bits = np.frombuffer(candidates.to_bytes((size + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(bits, count=size, bitorder="little").astype(bool)
+
+    def _weights(self, weights):
+        """Term and recipe weight arrays for a matcher.TermWeights, converted once."""
+        if self._weight_source is not weights:
+            self._term_weights = np.array(weights.term, dtype=np.int64)
+            self._recipe_weights = np.array(weights.recipe, dtype=np.int64)
+            self._weight_source = weights
+        return self._term_weights, self._recipe_weights
+
+    def scores(self, matched: Set[int], weights=None):
+        """
+        Returns (match counts, match scores) for every recipe in the catalog.
+        With `weights` (a matcher.TermWeights), counts are matched weights
+        and scores are shares of each recipe's total weight.
+        """
+        if weights is None:
+            term_values, lengths = np.ones(self.num_terms, dtype=np.int64), self.lengths
+        else:
+            term_values, lengths = self._weights(weights)
+        term_mask = np.zeros(self.num_terms, dtype=np.int64)
+        if matched:
+            ids = np.fromiter(matched, dtype=np.int64, count=len(matched))
+            term_mask[ids] = term_values[ids]
+        # Row sums of the CSR matrix times the term mask (integers, so exact)
+        hits = np.zeros(len(self.indices) + 1, dtype=np.int64)
+        np.cumsum(term_mask[self.indices], out=hits[1:])
+        counts = hits[self.indptr[1:]] - hits[self.indptr[:-1]]
+        scores = np.divide(counts, lengths, out=np.zeros(len(counts)), where=lengths > 0)
+        return counts, scores
+
+    def batch_size(self) -> int:
+        """How many pantries scores_many can score at once within BATCH_BYTES."""
+        return max(1, self.BATCH_BYTES // max(1, len(self.indices)))
+
+    def scores_many(self, matched_sets: List[Set[int]]):
+        """
+        Scores several pantries in one pass: the CSR matrix times a
+        (terms x queries) mask matrix. Returns a (recipes x queries) array.
+        """
+        num_queries = len(matched_sets)
+        # Extra all-zero term row so the padded index below is always valid
+        term_masks = np.zeros((self.num_terms + 1, num_queries), dtype=np.uint8)
+        for q, matched in enumerate(matched_sets):
+            if matched:
+                term_masks[np.fromiter(matched, dtype=np.int64, count=len(matched)), q] = 1
+        if len(self.lengths) == 0:
+            return np.zeros((0, num_queries))
+        hits = term_masks[np.append(self.indices, self.num_terms)]
+        counts = np.add.reduceat(hits, self.indptr[:-1], axis=0, dtype=np.int64)
+        # reduceat yields the next row's first element for empty rows
+        counts[self.lengths == 0] = 0
+        lengths = self.lengths[:, None]
+        return np.divide(counts, lengths, out=np.zeros(counts.shape), where=lengths > 0)
+
+    def select(self, matched: Set[int], candidates=None, weights=None, min_score: float = 0.0):
+        """
+        Returns (positions, negated scores) of the recipes with a non-zero
+        score of at least `min_score`. `candidates` is an optional boolean
+        mask over recipe positions; `weights` as for `scores`.
+        """
+        _, scores = self.scores(matched, weights)
+        keep = scores > 0
+        if min_score > 0:
+            keep &= scores >= min_score
+        if candidates is not None:
+            keep &= candidates
+        positions = np.flatnonzero(keep)
+        return positions, -scores[positions]
+
+    def top(self, positions, neg_scores, limit: Optional[int] = None):
+        """
+        Orders selected positions best first. With `limit`, only the top
+        `limit` positions are partitioned out and sorted.
+        """
+        if limit is not None and limit < len(positions):
+            if limit <= 0:
+                return positions[:0]
+            # Keep everything that ties with the limit-th best score so the
+            # exact (time, position) tie-break below still applies
+            kth = np.argpartition(neg_scores, limit - 1)[limit - 1]
+            within = neg_scores <= neg_scores[kth]
+            positions = positions[within]
+            neg_scores = neg_scores[within]
+
+        order = np.lexsort((positions, self.times[positions], neg_scores))
+        return positions[order][:limit]
+
+    def rank(self, matched: Set[int], candidates=None, limit: Optional[int] = None):
+        """Returns recipe positions with a non-zero score, best first."""
+        return self.top(*self.select(matched, candidates), limit)